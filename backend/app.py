@@ -1,12 +1,28 @@
+import hmac
 import json
 import os
 import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
 import numpy as np
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 import pandas as pd
-from sklearn.preprocessing import normalize
 import time
+from concurrent.futures import ThreadPoolExecutor
+from topk import batch_score_top_k, reciprocal_rank_fusion, score_top_k, scoring_dtype, sharded_score_top_k, top_groups, top_k_indices
+from dense_index import DEFAULT_ENCODER, EMBEDDINGS_FILE, DenseIndex, encode, load_encoder
+from doc_store import DocStore
+from model_registry import VersionWatcher, list_versions, read_manifest, resolve_model_dir
+from streamer_index import StreamerIndex
+from vector_index import IVFIndex, PQIndex
+from streamer_metadata import StreamerMetadata
+from result_cache import ResultCache, SQLiteResultCache, model_version, normalize_query
+from vocabulary import CONFIG_FILE as VECTORIZER_CONFIG_FILE, QueryVectorizer
+
+startup_time = time.time()
 
 # Set ROOT_PATH for linking files
 os.environ["ROOT_PATH"] = os.path.abspath(os.path.join("..", os.curdir))
@@ -14,22 +30,12 @@ os.environ["ROOT_PATH"] = os.path.abspath(os.path.join("..", os.curdir))
 # Get the directory of the current script (backend folder)
 current_directory = os.path.dirname(os.path.abspath(__file__))
 
-# Define models directory
-models_dir = os.path.join(current_directory, "models")
+# Define models directory (versioned builds live in subdirectories, see model_registry)
+models_root = os.path.join(current_directory, "models")
 
-# Specify the path to the JSON file (init.json) in the backend folder
+# Raw datasets, only read when there is no pre-computed model to serve
 json_path = os.path.join(current_directory, "init.json")
 
-# Load the JSON data with UTF-8 encoding (still needed for streamer info)
-with open(json_path, "r", encoding="utf-8") as file:
-    combined_data = json.load(file)
-
-# Extract the individual datasets (needed for document details)
-reddit_data = combined_data["reddit"]
-twitter_data = combined_data["twitter"]
-wiki_data = combined_data["wiki"]
-details_data = combined_data["details"]
-
 # Load CSV data about streamers for additional details
 csv_path = os.path.join(current_directory, "streamer_details.csv")
 streamer_csv = pd.read_csv(csv_path).fillna("")  # Safely fill NaNs with empty strings
@@ -41,19 +47,57 @@ for _, row in streamer_csv.iterrows():
     streamer_csv_data[name_upper] = dict(row)
 
 
+def memory_usage_mb():
+    """Return this process's (private, file-backed) resident memory in MB.
+    
+    Memory-mapped model files show up as file-backed pages, which are shared
+    between workers through the page cache. Falls back to peak RSS as private
+    memory where /proc is not available.
+    """
+    try:
+        usage = {}
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("RssAnon:", "RssFile:", "RssShmem:")):
+                    key, value = line.split(":", 1)
+                    usage[key] = int(value.split()[0]) / 1024
+        return usage.get("RssAnon", 0.0), usage.get("RssFile", 0.0) + usage.get("RssShmem", 0.0)
+    except OSError:
+        return peak_memory_mb(), 0.0
+
+
+def peak_memory_mb():
+    """Return this process's peak resident memory in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
 class OptimizedTFIDFSVDSearch:
     """Optimized version of TFIDFSVDSearch that loads pre-computed models"""
     
-    def __init__(self, models_dir):
+    def __init__(self, models_dir, chunk_size=None, n_shards=1, dense_path=None, dense_encoder=DEFAULT_ENCODER):
         self.models_dir = models_dir
+        self.chunk_size = chunk_size  # Score docs in row blocks of this size (None = all at once)
+        self.n_shards = n_shards  # Score docs as this many row shards on a thread pool (1 = in the request thread)
+        self._executor = None
+        self._executor_pid = None
+        self.dense_path = dense_path or os.path.join(models_dir, EMBEDDINGS_FILE)
+        self.dense_encoder_name = dense_encoder
         self.vectorizer = None
         self.u = None
         self.s = None
         self.vt = None
+        self.projection = None
         self.docs_compressed = None
-        self.doc_lookup = {}
-        self.index_to_word = {}
-        self.word_to_index = {}
+        self.doc_store = None
+        self.streamer_index = None
+        self.ivf_index = None
+        self.pq_index = None
+        self.dense_index = None
+        self.dense_encoder = None
+        self.model_version = None
         self.dimension_labels = []
         
     def load_model(self):
@@ -61,130 +105,350 @@ class OptimizedTFIDFSVDSearch:
         print("Loading pre-computed model components...")
         start_time = time.time()
         
-        # Load the vectorizer
-        vectorizer_path = os.path.join(self.models_dir, "vectorizer.pkl")
-        with open(vectorizer_path, "rb") as f:
-            self.vectorizer = pickle.load(f)
-            self.word_to_index = self.vectorizer.vocabulary_
+        # Load the query vectorizer (memory-mapped term table + idf weights)
+        self.vectorizer = QueryVectorizer(self.models_dir)
         
-        # Load SVD components
-        self.u = np.load(os.path.join(self.models_dir, "u_matrix.npy"))
+        # Load SVD components. The large matrices are memory-mapped read-only,
+        # so every worker on a host shares them through the page cache
+        self.u = np.load(os.path.join(self.models_dir, "u_matrix.npy"), mmap_mode="r")
         self.s = np.load(os.path.join(self.models_dir, "s_values.npy"))
-        self.vt = np.load(os.path.join(self.models_dir, "vt_matrix.npy"))
+        self.vt = np.load(os.path.join(self.models_dir, "vt_matrix.npy"), mmap_mode="r")
+        
+        # Load the query projection (vt.T folded with the singular values);
+        # models saved before it existed get it computed here instead
+        projection_path = os.path.join(self.models_dir, "query_projection.npy")
+        if os.path.isfile(projection_path):
+            self.projection = np.load(projection_path, mmap_mode="r")
+        else:
+            self.projection = np.ascontiguousarray((self.vt.T * self.s).astype(np.float32))
         
         # Load normalized document vectors
-        self.docs_compressed = np.load(os.path.join(self.models_dir, "docs_compressed.npy"))
+        self.docs_compressed = np.load(os.path.join(self.models_dir, "docs_compressed.npy"), mmap_mode="r")
+        
+        # float16 artifacts are storage-only; score them in float32 blocks
+        # rather than widening the whole matrix on every query
+        if self.docs_compressed.dtype == np.float16 and self.chunk_size is None:
+            self.chunk_size = 65536
+        
+        # Load the columnar document store (memory-mapped)
+        self.doc_store = DocStore(self.models_dir)
+        
+        # Load the streamer centroid index used for two-stage retrieval
+        if StreamerIndex.exists(self.models_dir):
+            self.streamer_index = StreamerIndex(self.models_dir)
         
-        # Load document lookup mappings
-        with open(os.path.join(self.models_dir, "doc_lookup.pkl"), "rb") as f:
-            self.doc_lookup = pickle.load(f)
+        # Load the IVF index used for approximate candidate retrieval, if built
+        if IVFIndex.exists(self.models_dir):
+            self.ivf_index = IVFIndex(self.models_dir)
+        
+        # Load the product-quantized codes used for compressed-domain scoring, if built
+        if PQIndex.exists(self.models_dir):
+            self.pq_index = PQIndex(self.models_dir)
+        
+        # Load the dense document embeddings and the CPU query encoder for
+        # hybrid retrieval; either one missing leaves hybrid search disabled
+        if os.path.isfile(self.dense_path):
+            try:
+                dense_index = DenseIndex(self.dense_path, len(self.doc_store))
+            except ValueError as e:
+                print(f"Dense retrieval disabled: {e}")
+            else:
+                encoder = load_encoder(self.dense_encoder_name)
+                if encoder is not None and encoder.get_sentence_embedding_dimension() != dense_index.dim:
+                    print(f"Dense retrieval disabled: encoder {self.dense_encoder_name!r} does not produce "
+                          f"{dense_index.dim}-dimensional embeddings")
+                elif encoder is not None:
+                    self.dense_encoder = encoder
+                    self.dense_index = dense_index
         
-        # Load word mappings
-        with open(os.path.join(self.models_dir, "index_to_word.pkl"), "rb") as f:
-            self.index_to_word = pickle.load(f)
+        # Cached search results are keyed on this, so a rebuilt model never
+        # serves results computed with the old one
+        self.model_version = model_version(self.models_dir)
         
         # Load dimension labels
         with open(os.path.join(self.models_dir, "dimension_labels.pkl"), "rb") as f:
             self.dimension_labels = pickle.load(f)
         
-        print(f"Model loading completed in {time.time() - start_time:.2f} seconds")
+        anon_mb, file_mb = memory_usage_mb()
+        print(
+            f"Model loading completed in {time.time() - start_time:.2f} seconds "
+            f"(docs: {self.docs_compressed.dtype}, RSS: {anon_mb:.1f} MB private + {file_mb:.1f} MB shared file-backed)"
+        )
         return self
     
-    def query(self, query_text, top_k=10):
-        """Transform a query and find the most similar documents - optimized version"""
-        start_time = time.time()
-        
+    def project_query(self, query_text):
+        """Map a query to a normalized vector in the weighted concept space"""
         # Transform query to TF-IDF space
         query_tfidf = self.vectorizer.transform([query_text])
         
-        # Project query to concept space
-        query_vec = query_tfidf @ self.vt.T
+        # The projection already holds vt.T scaled by the singular values, so
+        # the sparse @ dense product only has to gather the query's term rows
+        query_vec = query_tfidf.data @ self.projection[query_tfidf.indices]
+        
+        # Normalize for cosine similarity (all-zero for out-of-vocabulary queries)
+        norm = np.linalg.norm(query_vec)
+        return query_vec / norm if norm > 0 else query_vec
+    
+    def query(self, query_text, top_k=10, explain=False, nprobe=None, rerank=None):
+        """Transform a query and find the most similar documents - optimized version
         
-        # Scale query vector by singular values to weight important dimensions more
-        weighted_query_vec = query_vec @ np.diag(self.s)
+        With explain=True each result also gets "top_dimensions", the SVD
+        dimensions that contributed most to its score. With nprobe set (and an
+        IVF index loaded) only the documents of the nprobe closest lists are
+        scored. With rerank set (and PQ codes loaded) every document is scored
+        on its product-quantized codes and the top_k * rerank best are
+        re-scored exactly.
+        """
+        start_time = time.time()
         
-        # Normalize for cosine similarity
-        query_vec_norm = normalize(weighted_query_vec)
+        # Project the query to the (singular value weighted) concept space
+        query_vec_norm = self.project_query(query_text)
         
-        # Compute cosine similarity with all documents - this is a single matrix operation
+        # Compute cosine similarity with all documents and keep the top-k
         # Shape of docs_compressed: [n_docs, n_components]
-        # Shape of query_vec_norm.T: [n_components, 1]
-        # Result shape: [n_docs, 1]
-        similarities = self.docs_compressed @ query_vec_norm.T
+        # Shape of query_vec_norm: [n_components]
+        # Only the k winners get sorted (argpartition), optionally in row chunks
+        top_indices, top_scores = self._top_documents(query_vec_norm, top_k, nprobe, rerank)
+
+        print(f"Found top {top_k} matches in {time.time() - start_time:.4f} seconds")
+
+        results = self._format_results(top_indices, top_scores, query_vec_norm, explain=explain)
+            
+        print(f"Total search time: {time.time() - start_time:.4f} seconds")
+        return results
+    
+    def project_queries(self, query_texts):
+        """Map many queries to normalized concept space vectors, shape [n_queries, n_components]"""
+        # One transform call for the whole batch, then one sparse @ dense product
+        query_tfidf = self.vectorizer.transform(query_texts)
+        query_vecs = np.asarray(query_tfidf @ self.projection)
         
-        # Get top-k most similar document indices (fastest part)
-        top_indices = np.argsort(-similarities.flatten())[:top_k]
+        norms = np.linalg.norm(query_vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return query_vecs / norms
+    
+    def query_batch(self, query_texts, top_k=10, batch_size=64, explain=False):
+        """Find the most similar documents for many queries at once.
         
-        print(f"Found top {top_k} matches in {time.time() - start_time:.4f} seconds")
+        Queries are scored `batch_size` at a time with a single matrix-matrix
+        product against docs_compressed. Returns one result list per query,
+        in the same format as query().
+        """
+        start_time = time.time()
+        all_results = [
+            self._format_results(top_indices, top_scores, query_vec_norm, explain=explain)
+            for top_indices, top_scores, query_vec_norm in self._score_batch(query_texts, top_k, batch_size)
+        ]
+        print(f"Batch search for {len(query_texts)} queries in {time.time() - start_time:.4f} seconds")
+        return all_results
+    
+    def query_streamers(self, query_text, top_streamers=10, docs_per_streamer=5, candidates=1000, explain=False,
+                        nprobe=None, rerank=None):
+        """Find the best matching streamers for a query.
         
-        # Format results
-        results = []
-        for doc_idx in top_indices:
-            source, streamer, idx, data = self.doc_lookup[doc_idx]
-            similarity_score = float(similarities[doc_idx, 0])
-            
-            # Find top contributing dimensions for this document
-            doc_factors = self.u[doc_idx]
-            query_factors = query_vec_norm[0]
-            
-            # Calculate contribution of each dimension to similarity score
-            dimension_contributions = doc_factors * query_factors
-            top_dim_indices = np.argsort(-dimension_contributions)[:3]  # Top 3 dimensions
-            
-            top_dimensions = [
+        The top `candidates` documents are aggregated per streamer id with
+        vectorized segment reductions: streamers are ranked by the summed
+        scores of their best `docs_per_streamer` documents. Only the
+        documents shown for the returned streamers get formatted. nprobe and
+        rerank switch candidate retrieval to the IVF index or the PQ codes,
+        as in query().
+        Returns a list of (streamer_id, results) pairs, best first.
+        """
+        start_time = time.time()
+        query_vec_norm = self.project_query(query_text)
+        top_indices, top_scores = self._top_documents(query_vec_norm, candidates, nprobe, rerank)
+        streamers = self._aggregate_streamers(
+            top_indices, top_scores, query_vec_norm, top_streamers, docs_per_streamer, explain
+        )
+        print(f"Streamer search over {len(top_indices)} candidates in {time.time() - start_time:.4f} seconds")
+        return streamers
+    
+    def query_streamers_two_stage(self, query_text, top_streamers=10, docs_per_streamer=5, shortlist=50,
+                                  explain=False):
+        """Two-stage streamer search: rank streamer centroids, then re-rank their documents.
+        
+        The query is scored against the small [n_streamers, n_components]
+        centroid matrix first; only the documents of the `shortlist` best
+        streamers are then scored and aggregated like query_streamers(). Cost
+        scales with the number of streamers rather than the number of
+        documents. Returns a list of (streamer_id, results) pairs, best first.
+        """
+        start_time = time.time()
+        query_vec_norm = self.project_query(query_text)
+        compute_dtype = scoring_dtype(self.docs_compressed.dtype)
+        query_vec = query_vec_norm.astype(compute_dtype)
+        
+        # Stage 1: shortlist streamers by centroid similarity
+        centroid_scores = self.streamer_index.centroids.astype(compute_dtype, copy=False) @ query_vec
+        shortlisted = top_k_indices(centroid_scores, shortlist)
+        
+        # Stage 2: score every document of the shortlisted streamers
+        doc_indices = self.streamer_index.documents_of(shortlisted)
+        doc_scores = self.docs_compressed[doc_indices].astype(compute_dtype, copy=False) @ query_vec
+        order = top_k_indices(doc_scores, len(doc_scores))
+        
+        streamers = self._aggregate_streamers(
+            doc_indices[order], doc_scores[order], query_vec_norm, top_streamers, docs_per_streamer, explain
+        )
+        print(f"Two-stage streamer search over {len(doc_indices)} documents in {time.time() - start_time:.4f} seconds")
+        return streamers
+    
+    def query_streamers_hybrid(self, query_text, top_streamers=10, docs_per_streamer=5, candidates=1000,
+                               fusion="rrf", alpha=0.5, explain=False):
+        """Streamer search over the fused TF-IDF/SVD and dense embedding rankings.
+        
+        Both retrievers return their top `candidates` documents. With
+        fusion="rrf" the two rankings are merged by reciprocal rank; with
+        fusion="blend" every candidate is re-scored by both models and ranked
+        by alpha * svd_score + (1 - alpha) * dense_score. The fused ranking
+        is aggregated per streamer like query_streamers(). RRF sums only
+        order the results; their sim_score is the TF-IDF/SVD cosine, as in
+        the other modes (the blend reports its blended score).
+        """
+        start_time = time.time()
+        query_vec_norm = self.project_query(query_text)
+        dense_vec = encode(self.dense_encoder, [query_text])[0]
+        
+        svd_indices, _ = self._top_documents(query_vec_norm, candidates)
+        dense_indices, _ = self.dense_index.search(dense_vec, candidates)
+        
+        compute_dtype = scoring_dtype(self.docs_compressed.dtype)
+        if fusion == "blend":
+            doc_indices = np.union1d(svd_indices, dense_indices)
+            svd_scores = self.docs_compressed[doc_indices].astype(compute_dtype, copy=False) @ query_vec_norm.astype(compute_dtype)
+            scores = alpha * svd_scores + (1 - alpha) * self.dense_index.scores(doc_indices, dense_vec)
+            order = top_k_indices(scores, candidates)
+            top_indices, top_scores = doc_indices[order], scores[order]
+            shown_scores = None
+        else:
+            top_indices, top_scores = reciprocal_rank_fusion([svd_indices, dense_indices])
+            top_indices, top_scores = top_indices[:candidates], top_scores[:candidates]
+            shown_scores = self.docs_compressed[top_indices].astype(compute_dtype, copy=False) @ query_vec_norm.astype(compute_dtype)
+        
+        streamers = self._aggregate_streamers(
+            top_indices, top_scores, query_vec_norm, top_streamers, docs_per_streamer, explain,
+            shown_scores=shown_scores
+        )
+        print(f"Hybrid ({fusion}) streamer search over {len(top_indices)} candidates in {time.time() - start_time:.4f} seconds")
+        return streamers
+    
+    def query_streamers_batch(self, query_texts, top_streamers=10, docs_per_streamer=5, candidates=1000,
+                              batch_size=64, explain=False):
+        """Batched query_streamers(); returns one (streamer_id, results) list per query"""
+        return [
+            self._aggregate_streamers(
+                top_indices, top_scores, query_vec_norm, top_streamers, docs_per_streamer, explain
+            )
+            for top_indices, top_scores, query_vec_norm in self._score_batch(query_texts, candidates, batch_size)
+        ]
+    
+    def _top_documents(self, query_vec_norm, top_k, nprobe=None, rerank=None):
+        """Return (indices, scores) of the top_k documents, exact or through the IVF / PQ index"""
+        if nprobe and self.ivf_index is not None:
+            return self.ivf_index.search(query_vec_norm, top_k, nprobe=nprobe)
+        if rerank and self.pq_index is not None:
+            return self.pq_index.search(query_vec_norm, top_k, self.docs_compressed, rerank=rerank)
+        if self.n_shards > 1:
+            return sharded_score_top_k(
+                self.docs_compressed, query_vec_norm, top_k, self.executor(), self.n_shards, chunk_size=self.chunk_size
+            )
+        return score_top_k(self.docs_compressed, query_vec_norm, top_k, chunk_size=self.chunk_size)
+    
+    def executor(self):
+        """Thread pool for sharded scoring, created per process (threads do not survive a fork)"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.n_shards, thread_name_prefix="score-shard")
+            self._executor_pid = os.getpid()
+        return self._executor
+    
+    def _score_batch(self, query_texts, top_k, batch_size):
+        """Yield (top_indices, top_scores, query_vec_norm) for each query, scoring batch_size at a time"""
+        query_vecs = self.project_queries(query_texts)
+        # Documents are scored in row blocks, so at most [batch_size, chunk_size]
+        # scores (and one widened block of float16 storage) exist at a time
+        chunk_size = self.chunk_size or 65536
+        for start in range(0, len(query_texts), batch_size):
+            batch_vecs = query_vecs[start:start + batch_size]
+            batch_top = batch_score_top_k(self.docs_compressed, batch_vecs, top_k, chunk_size=chunk_size)
+            for (top_indices, top_scores), query_vec_norm in zip(batch_top, batch_vecs):
+                yield top_indices, top_scores, query_vec_norm
+    
+    def _aggregate_streamers(self, top_indices, top_scores, query_vec_norm, top_streamers, docs_per_streamer, explain,
+                             shown_scores=None):
+        """Group ranked candidate documents into (streamer_id, results) pairs.
+        
+        top_scores rank the documents and streamers; shown_scores, if given,
+        are reported as each result's sim_score instead.
+        """
+        streamer_ids = self.doc_store.streamer_ids[top_indices]
+        ranked_ids, positions = top_groups(streamer_ids, top_scores, top_streamers, docs_per_streamer)
+        if not positions:
+            return []
+        
+        # Format the shown documents in one pass, then split them per streamer
+        selected = np.concatenate(positions)
+        shown_scores = top_scores if shown_scores is None else shown_scores
+        results = self._format_results(top_indices[selected], shown_scores[selected], query_vec_norm, explain=explain)
+        streamers = []
+        offset = 0
+        for streamer_id, streamer_positions in zip(ranked_ids.tolist(), positions):
+            streamers.append((streamer_id, results[offset:offset + len(streamer_positions)]))
+            offset += len(streamer_positions)
+        return streamers
+    
+    def explain_results(self, top_indices, query_vec_norm, n_dims=3):
+        """Return the top contributing SVD dimensions for each result document.
+        
+        Contributions for all documents are computed in one array operation
+        and only the n_dims winners per row get sorted.
+        """
+        # Contribution of each dimension to each document's similarity score
+        # Shape: [len(top_indices), n_components]
+        contributions = self.u[top_indices] * query_vec_norm
+        n_dims = min(n_dims, contributions.shape[1])
+        top_dims = np.argpartition(-contributions, n_dims - 1, axis=1)[:, :n_dims]
+        top_values = np.take_along_axis(contributions, top_dims, axis=1)
+        order = np.argsort(-top_values, axis=1)
+        top_dims = np.take_along_axis(top_dims, order, axis=1).tolist()
+        top_values = np.take_along_axis(top_values, order, axis=1).tolist()
+        
+        return [
+            [
                 {
-                    "index": int(dim_idx),
+                    "index": dim_idx,
                     "label": self.dimension_labels[dim_idx],
-                    "contribution": float(dimension_contributions[dim_idx])
+                    "contribution": value
                 }
-                for dim_idx in top_dim_indices
+                for dim_idx, value in zip(doc_dims, doc_values)
             ]
-            
-            # Create document text representation
+            for doc_dims, doc_values in zip(top_dims, top_values)
+        ]
+    
+    def _format_results(self, top_indices, top_scores, query_vec_norm, explain=False):
+        """Build the result dicts for the selected documents"""
+        explanations = self.explain_results(top_indices, query_vec_norm) if explain and len(top_indices) else None
+        
+        # Only the selected rows of the document store are read
+        documents = self.doc_store.get_documents(top_indices)
+        
+        results = []
+        for rank, (document, similarity_score) in enumerate(zip(documents, top_scores)):
+            source, streamer, snippet, reddit_score, reddit_id = document
+            result = {
+                "source": source,
+                "name": streamer,
+                "doc": snippet,
+                "sim_score": round(float(similarity_score) * 100, 2)
+            }
             if source == "reddit":
-                text = data["Title"]
-                score = data["Score"]
-                reddit_id = data["ID"]
-                result = {
-                    "source": source,
-                    "name": streamer,
-                    "doc": text[:150] + "..." if len(text) > 150 else text,
-                    "sim_score": round(similarity_score * 100, 2),
-                    "reddit_score": score,
-                    "id": reddit_id,
-                    "top_dimensions": top_dimensions
-                }
-            elif source == "twitter":
-                text = data
-                result = {
-                    "source": source,
-                    "name": streamer,
-                    "doc": text[:150] + "..." if len(text) > 150 else text,
-                    "sim_score": round(similarity_score * 100, 2),
-                    "top_dimensions": top_dimensions
-                }
-            elif source == "wiki":
-                text = data["wikipedia_summary"] if isinstance(data, dict) else str(data)
-                result = {
-                    "source": source,
-                    "name": streamer,
-                    "doc": text[:150] + "..." if len(text) > 150 else text,
-                    "sim_score": round(similarity_score * 100, 2),
-                    "top_dimensions": top_dimensions
-                }
-            elif source == "details":
-                text = data.get("Description", "")
-                result = {
-                    "source": source,
-                    "name": streamer,
-                    "doc": text[:150] + "..." if len(text) > 150 else text,
-                    "sim_score": round(similarity_score * 100, 2),
-                    "top_dimensions": top_dimensions
-                }
+                result["reddit_score"] = reddit_score
+                result["id"] = reddit_id
+            
+            if explanations is not None:
+                result["top_dimensions"] = explanations[rank]
             
             results.append(result)
             
-        print(f"Total search time: {time.time() - start_time:.4f} seconds")
         return results
     
     def analyze_svd_components(self, n_terms=10):
@@ -193,7 +457,7 @@ class OptimizedTFIDFSVDSearch:
         for i in range(len(self.dimension_labels)):
             dimension = self.vt[i, :]
             top_indices = np.argsort(-dimension)[:n_terms]
-            top_terms = [self.index_to_word[idx] for idx in top_indices]
+            top_terms = [self.vectorizer.get_term(idx) for idx in top_indices]
             results.append((i, top_terms, self.dimension_labels[i]))
         return results
         
@@ -202,58 +466,193 @@ class OptimizedTFIDFSVDSearch:
         return self.s
 
 
-def get_twitch_info(streamer_name):
-    """Get Twitch page info for a streamer if available."""
-    variants = [
-        streamer_name,
-        streamer_name.upper(),
-        streamer_name.lower(),
-        streamer_name.title(),
-        streamer_name.replace(" ", "")
-    ]
-    for name_variant in variants:
-        if name_variant in streamer_csv_data:
-            data = streamer_csv_data[name_variant]
-            if "Twitch URL" in data and data["Twitch URL"].strip():
-                return data
-            else:
-                default_url = f"https://www.twitch.tv/{streamer_name}"
-                data["url"] = default_url
-                return data
-    print(f"No Twitch data found for streamer: {streamer_name}")
-    return None
+def is_truthy(value):
+    """Interpret a request flag such as ?explain=1 or {"explain": true}"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
 
-def get_streamer_image_path(streamer_name):
-    """Get the image path for a streamer if available."""
-    image_paths = [
-        f"images/streamer_images/{streamer_name.upper()}.jpg",
-        f"images/streamer_images/{streamer_name}.jpg",
-        f"images/streamer_images/{streamer_name.lower()}.jpg",
-        f"images/streamer_images/{streamer_name.replace(' ', '')}.jpg"
-    ]
-    return image_paths[0]
-
-def get_csv_streamer_info(streamer_name):
-    """Look up extra CSV info for the streamer from streamer_details.csv."""
-    name_upper = streamer_name.upper().strip()
-    return streamer_csv_data.get(name_upper, None)
+def json_response(body):
+    return app.response_class(body, mimetype="application/json")
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+def build_engine(directory):
+    """Load the optimized search engine for a model directory, configured from the environment"""
+    chunk_size = int(os.environ["SEARCH_CHUNK_SIZE"]) if os.environ.get("SEARCH_CHUNK_SIZE") else None
+    # SEARCH_SHARDS > 1 scores each query's documents on that many threads
+    n_shards = int(os.environ.get("SEARCH_SHARDS", 1))
+    # DENSE_EMBEDDINGS / DENSE_ENCODER point hybrid search at the document
+    # embeddings and a locally available sentence-transformers model
+    engine = OptimizedTFIDFSVDSearch(
+        directory, chunk_size=chunk_size, n_shards=n_shards,
+        dense_path=os.environ.get("DENSE_EMBEDDINGS"),
+        dense_encoder=os.environ.get("DENSE_ENCODER", DEFAULT_ENCODER)
+    )
+    return engine.load_model()
+
+
+class ActiveModel:
+    """A loaded search engine together with the streamer metadata built for it.
+
+    Requests read the module-level active_model once and use that object
+    throughout, so a reload that swaps in a new one never mixes two models
+    within a request. The old engine (and its memory-mapped artifacts) is
+    released when the last request holding it finishes.
+    """
+
+    def __init__(self, engine, directory):
+        self.engine = engine
+        self.directory = directory
+        manifest = read_manifest(directory)
+        self.version = manifest["version"] if manifest else engine.model_version
+        self.manifest = manifest
+        self.loaded_at = time.time()
+        # Resolve CSV details, Twitch URLs, image paths and card JSON once per indexed streamer
+        self.metadata = StreamerMetadata(engine.doc_store.streamer_names, streamer_csv_data)
+
+
+def reload_model(version=None):
+    """Load a model version (default: models/CURRENT) and swap it in.
+
+    The new engine is fully loaded before the swap, which is a single
+    reference assignment; requests already running finish on the old one.
+    """
+    with reload_lock:
+        return _reload_locked(version)
+
+
+def _reload_locked(version):
+    """reload_model() for a caller that already holds reload_lock"""
+    global active_model
+    directory = resolve_model_dir(models_root, version)
+    start_time = time.time()
+    reload_status.update(state="loading", target=os.path.basename(directory), error=None)
+    try:
+        if not os.path.isfile(os.path.join(directory, VECTORIZER_CONFIG_FILE)):
+            raise FileNotFoundError(f"No model found in {directory}")
+        model = ActiveModel(build_engine(directory), directory)
+    except Exception as e:
+        reload_status.update(state="failed", error=str(e))
+        raise
+    active_model = model
+    reload_status.update(state="idle", target=None)
+    print(f"Swapped in model version {model.version} in {time.time() - start_time:.2f} seconds")
+    return model
+
+
+def start_reload(version=None):
+    """Reload in a background thread; returns False if a reload is already running.
+
+    The lock is taken here, without waiting, and handed to the thread, so
+    of two concurrent calls (or a call racing the CURRENT watcher) only one
+    starts a reload.
+    """
+    if not reload_lock.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            _reload_locked(version)
+        except Exception as e:
+            print(f"Model reload failed: {e}")
+        finally:
+            reload_lock.release()
+
+    threading.Thread(target=run, name="model-reload", daemon=True).start()
+    return True
+
+
+reload_lock = threading.Lock()
+reload_status = {"state": "idle", "target": None, "error": None}
+
+# Models live in models/<version>/ with models/CURRENT naming the one to
+# serve (or directly in models/ for builds made before versioning)
+models_dir = resolve_model_dir(models_root)
+
+def build_fallback_model():
+    """Fit a model from init.json into a temporary directory and return that directory.
+
+    Only used when models/ has no usable build; the raw data is loaded here
+    and nowhere else, so normal startups never parse init.json.
+    """
+    from preprocess_data import TFIDFSVDSearch
+    with open(json_path, "r", encoding="utf-8") as file:
+        combined_data = json.load(file)
+    fallback_engine = TFIDFSVDSearch(n_components=30)
+    fallback_engine.preprocess_documents(
+        combined_data["reddit"], combined_data["twitter"], combined_data["wiki"], combined_data["details"]
+    )
+    fallback_engine.fit()
+    directory = tempfile.mkdtemp(prefix="stream-finder-model-")
+    fallback_engine.save_model(directory)
+    return directory
+
+
 # Check if pre-computed models exist
-if os.path.exists(models_dir) and os.path.isfile(os.path.join(models_dir, "vectorizer.pkl")):
+if os.path.isfile(os.path.join(models_dir, VECTORIZER_CONFIG_FILE)):
     print("Found pre-computed models. Loading optimized search engine...")
-    search_engine = OptimizedTFIDFSVDSearch(models_dir)
-    search_engine.load_model()
+    active_model = ActiveModel(build_engine(models_dir), models_dir)
 else:
+    if os.path.isfile(os.path.join(models_dir, "vectorizer.pkl")):
+        print(f"The model in {models_dir} was built by an older preprocess_data.py (vectorizer.pkl).")
     print("Pre-computed models not found. Please run preprocess_data.py first.")
-    print("Falling back to in-memory computation (slower startup)...")
-    from preprocess_data import TFIDFSVDSearch
-    search_engine = TFIDFSVDSearch(n_components=30)
-    search_engine.preprocess_documents(reddit_data, twitter_data, wiki_data, details_data)
-    search_engine.fit()
+    print("Falling back to building a model from init.json (slower startup)...")
+    fallback_dir = build_fallback_model()
+    active_model = ActiveModel(build_engine(fallback_dir), fallback_dir)
+
+# Poll models/CURRENT every MODEL_WATCH_INTERVAL seconds (0 disables) and
+# hot-swap newly published versions; POST /admin/reload does it on demand
+model_watch_interval = float(os.environ.get("MODEL_WATCH_INTERVAL", 10))
+model_watcher = None
+model_watcher_pid = None
+
+# Admin endpoints require this token in X-Admin-Token and are disabled
+# without one (behind a local reverse proxy every request comes from localhost)
+admin_token = os.environ.get("ADMIN_TOKEN")
+
+# Number of top documents aggregated per streamer for each /search
+search_candidates = int(os.environ.get("SEARCH_CANDIDATES", 1000))
+
+# Largest number of queries accepted by one /search/batch request
+search_batch_max_queries = int(os.environ.get("SEARCH_BATCH_MAX_QUERIES", 256))
+
+# Default retrieval mode ("docs", "centroid", "ann", "pq" or "hybrid") and the centroid-stage shortlist size
+search_mode = os.environ.get("SEARCH_MODE", "docs")
+search_shortlist = int(os.environ.get("SEARCH_SHORTLIST", 50))
+
+# IVF lists probed per query in "ann" mode (more lists: higher recall, slower)
+search_nprobe = int(os.environ.get("SEARCH_NPROBE", 8))
+
+# Candidates re-scored exactly per returned document in "pq" mode
+search_pq_rerank = int(os.environ.get("SEARCH_PQ_RERANK", 4))
+
+# Default fusion for "hybrid" mode ("rrf" or "blend") and the blend's TF-IDF/SVD weight
+search_fusion = os.environ.get("SEARCH_FUSION", "rrf")
+search_alpha = float(os.environ.get("SEARCH_ALPHA", 0.5))
+
+# Cache for serialized /search responses, keyed on the model version.
+# RESULT_CACHE_BACKEND=sqlite shares one cache between all workers on the host
+cache_limits = {
+    "max_entries": int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1024)),
+    "max_bytes": int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    "ttl": float(os.environ["RESULT_CACHE_TTL"]) if os.environ.get("RESULT_CACHE_TTL") else None
+}
+if os.environ.get("RESULT_CACHE_BACKEND", "memory") == "sqlite":
+    cache_path = os.environ.get(
+        "RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "stream-finder-result-cache.sqlite3")
+    )
+    try:
+        result_cache = SQLiteResultCache(cache_path, **cache_limits)
+    except sqlite3.Error as e:  # unwritable directory, locked or corrupt file
+        print(f"Could not open result cache {cache_path}, using a per-process cache instead: {e}")
+        result_cache = ResultCache(**cache_limits)
+else:
+    result_cache = ResultCache(**cache_limits)
+
+print(f"Startup completed in {time.time() - startup_time:.2f} seconds (peak RSS: {peak_memory_mb():.1f} MB)")
 
 @app.route("/")
 def home():
@@ -265,45 +664,158 @@ def search_streamer():
     if not query:
         return jsonify([])
     
-    # Use the SVD-powered search
-    results = search_engine.query(query, top_k=50)  # Get top 50 results
+    # Dimension explanations are opt-in, only callers rendering tags pay for them
+    explain = is_truthy(request.args.get("explain", ""))
     
-    # Group results by streamer
-    streamer_results = {}
-    for result in results:
-        streamer = result["name"]
-        if streamer not in streamer_results:
-            streamer_results[streamer] = {
-                "documents": [],
-                "twitch_info": get_twitch_info(streamer),
-                "total_score": 0
-            }
-        streamer_results[streamer]["documents"].append(result)
-        streamer_results[streamer]["total_score"] += result["sim_score"]
+    # mode=centroid ranks streamer centroids first and re-ranks only their documents;
+    # mode=ann retrieves candidates from the IVF index, probing `nprobe` lists;
+    # mode=pq scores product-quantized codes and re-ranks the best `rerank` x candidates exactly;
+    # mode=hybrid fuses TF-IDF/SVD with dense embeddings (fusion=rrf|blend, alpha)
+    # Read the active model once so a concurrent reload cannot change it mid-request
+    model = active_model
+    search_engine = model.engine
+    mode = request.args.get("mode", search_mode)
+    if mode == "centroid" and search_engine.streamer_index is None:
+        mode = "docs"
+    if mode == "ann" and search_engine.ivf_index is None:
+        mode = "docs"
+    if mode == "pq" and search_engine.pq_index is None:
+        mode = "docs"
+    if mode == "hybrid" and search_engine.dense_index is None:
+        mode = "docs"
+    nprobe = rerank = None
+    if mode == "ann":
+        # Probing fewer than one or more than every list is meaningless, so clamp
+        nprobe = request.args.get("nprobe", search_nprobe, type=int)
+        nprobe = min(max(nprobe, 1), search_engine.ivf_index.n_lists)
+    if mode == "pq":
+        rerank = request.args.get("rerank", search_pq_rerank, type=int)
+        if rerank < 1:
+            return jsonify({"error": "rerank must be a positive integer"}), 400
+    fusion = request.args.get("fusion", search_fusion)
+    if fusion not in ("rrf", "blend"):
+        fusion = "rrf"
+    alpha = request.args.get("alpha", search_alpha, type=float)
     
-    final_results = []
-    for streamer, data in streamer_results.items():
-        csv_info = get_csv_streamer_info(streamer)
-        final_results.append({
-            "name": streamer,
-            "documents": data["documents"][:5],  # Limit to top 5 documents per streamer
-            "twitch_info": data["twitch_info"],
-            "image_path": get_streamer_image_path(streamer),
-            "csv_data": csv_info
-        })
+    # Repeat queries are served from the serialized response cache
+    mode_key = mode
+    if mode == "ann":
+        mode_key = f"ann{nprobe}"
+    elif mode == "pq":
+        mode_key = f"pq{rerank}"
+    elif mode == "hybrid":
+        mode_key = f"hybrid-{fusion}" + (f"{alpha:g}" if fusion == "blend" else "")
+    cache_key = f"{mode_key}:{int(explain)}:{normalize_query(query)}"
+    version = search_engine.model_version
+    cached = result_cache.get(version, cache_key)
+    if cached is not None:
+        return json_response(cached)
     
-    # Sort by total similarity score
-    final_results.sort(
-        key=lambda x: sum([doc["sim_score"] for doc in x["documents"]]) if x["documents"] else 0, 
-        reverse=True
-    )
+    # Use the SVD-powered search, aggregating the candidate pool per streamer
+    if mode == "centroid":
+        streamers = search_engine.query_streamers_two_stage(query, shortlist=search_shortlist, explain=explain)
+    elif mode == "hybrid":
+        streamers = search_engine.query_streamers_hybrid(
+            query, candidates=search_candidates, fusion=fusion, alpha=alpha, explain=explain
+        )
+    else:
+        streamers = search_engine.query_streamers(
+            query, candidates=search_candidates, explain=explain, nprobe=nprobe, rerank=rerank
+        )
+    body = model.metadata.cards_json(streamers).encode("utf-8")
+    result_cache.set(version, cache_key, body)
+    return json_response(body)
+
+@app.route("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and size of the /search result cache"""
+    return jsonify(result_cache.stats())
+
+@app.route("/search/batch", methods=["POST"])
+def search_streamer_batch():
+    """Run many searches in one request: {"queries": [...], "candidates": 1000, "explain": false}"""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "body must be a JSON object"}), 400
+    queries = payload.get("queries", [])
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "queries must be a list of strings"}), 400
+    if len(queries) > search_batch_max_queries:
+        return jsonify({"error": f"at most {search_batch_max_queries} queries per batch"}), 400
+    candidates = payload.get("candidates", search_candidates)
+    if isinstance(candidates, bool) or not isinstance(candidates, int) or candidates < 1:
+        return jsonify({"error": "candidates must be a positive integer"}), 400
+    explain = is_truthy(payload.get("explain", False))
     
-    # Return the top results (limited to improve performance)
-    return jsonify(final_results[:10])
+    # Empty queries get an empty result, matching /search
+    non_empty = [q for q in queries if q]
+    model = active_model
+    batch_results = model.engine.query_streamers_batch(
+        non_empty, candidates=candidates, explain=explain
+    ) if non_empty else []
+    results_by_query = dict(zip(non_empty, batch_results))
+    return json_response("[" + ",".join(
+        '{"query":' + json.dumps(q) + ',"results":'
+        + model.metadata.cards_json(results_by_query[q] if q else []) + "}"
+        for q in queries
+    ) + "]")
+
+def admin_denied():
+    """Error response for a request to an admin endpoint, or None if it is allowed"""
+    if not admin_token:
+        return jsonify({"error": "admin endpoints are disabled; set ADMIN_TOKEN to enable them"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode("utf-8"), admin_token.encode("utf-8")):
+        return jsonify({"error": "forbidden"}), 403
+    return None
+
+@app.before_request
+def ensure_model_watcher():
+    """Start the CURRENT watcher lazily, once per worker process"""
+    global model_watcher, model_watcher_pid
+    if model_watch_interval <= 0:
+        return
+    if model_watcher_pid != os.getpid() or not model_watcher.is_alive():
+        model_watcher_pid = os.getpid()
+        model_watcher = VersionWatcher(
+            models_root, model_watch_interval,
+            lambda version: reload_model(version) if version != active_model.version else None,
+            version=active_model.version
+        ).start()
+
+@app.route("/admin/model")
+def admin_model():
+    """The version being served, its manifest and the state of the last reload"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    model = active_model
+    return jsonify({
+        "version": model.version,
+        "directory": model.directory,
+        "loaded_at": model.loaded_at,
+        "manifest": model.manifest,
+        "reload": reload_status
+    })
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    """Load a model version in the background and swap it in: {"version": "..."} (default: CURRENT)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    version = (request.get_json(silent=True) or {}).get("version")
+    if version is not None and version not in list_versions(models_root):
+        return jsonify({"error": "version must be a published version under models/"}), 400
+    if not start_reload(version):
+        return jsonify({"error": "a reload is already in progress", "reload": reload_status}), 409
+    return jsonify({"reloading": version or "CURRENT"}), 202
 
 # Additional endpoint for SVD analysis
 @app.route("/analyze_svd")
 def analyze_svd():
+    search_engine = active_model.engine
     components = search_engine.analyze_svd_components(n_terms=15)
     singular_values = search_engine.plot_singular_values().tolist()
     return jsonify({
@@ -0,0 +1,448 @@
+"""Micro-benchmarks for the search backend.
+
+Run from the backend folder, e.g.:
+    python benchmarks.py topk --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+import scipy.sparse as sp
+from scipy.sparse.linalg import svds
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+from randomized_svd import randomized_svd
+from topk import reciprocal_rank_fusion, score_top_k, sharded_score_top_k
+from vector_index import IVFIndex, PQIndex, save_ivf_index, save_pq_index
+from vocabulary import QueryVectorizer, check_parity, save_vocabulary
+
+
+def _percentiles(timings_ms):
+    return np.percentile(timings_ms, 50), np.percentile(timings_ms, 99)
+
+
+def _time_calls(fn, args_list):
+    """Call fn once per argument tuple and return the latencies in milliseconds"""
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def _random_unit_rows(rng, n_rows, n_dims, dtype=np.float64):
+    rows = rng.standard_normal((n_rows, n_dims)).astype(dtype)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows
+
+
+def _peak_allocation_mb(fn, args):
+    """Peak memory allocated (beyond what already existed) during one call, in MB"""
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def _clustered_unit_rows(rng, n_rows, n_dims, n_clusters):
+    """Unit rows drawn around random cluster centres, closer to real document vectors than uniform noise"""
+    centres = _random_unit_rows(rng, n_clusters, n_dims)
+    rows = centres[rng.integers(n_clusters, size=n_rows)] + 0.3 * rng.standard_normal((n_rows, n_dims))
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows.astype(np.float32)
+
+
+def _load_or_generate_docs(args, rng):
+    if args.models_dir:
+        return np.load(os.path.join(args.models_dir, "docs_compressed.npy"), mmap_mode="r")
+    return _clustered_unit_rows(rng, args.docs, args.dims, args.clusters)
+
+
+def _recall(approx_indices, exact_indices):
+    return len(np.intersect1d(approx_indices, exact_indices)) / max(len(exact_indices), 1)
+
+
+def bench_topk(args):
+    """p50/p99 query latency of full argsort vs argpartition vs chunked top-k"""
+    rng = np.random.default_rng(0)
+    print(f"{'n_docs':>10} {'method':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for n_docs in args.sizes:
+        docs = _random_unit_rows(rng, n_docs, args.dims)
+        queries = [(q,) for q in _random_unit_rows(rng, args.queries, args.dims)]
+
+        def full_sort(q):
+            scores = docs @ q
+            return np.argsort(-scores)[:args.k]
+
+        methods = {
+            "argsort": full_sort,
+            "argpartition": lambda q: score_top_k(docs, q, args.k),
+            "chunked": lambda q: score_top_k(docs, q, args.k, chunk_size=args.chunk_size),
+        }
+        for name, fn in methods.items():
+            p50, p99 = _percentiles(_time_calls(fn, queries))
+            print(f"{n_docs:>10} {name:>12} {p50:>10.3f} {p99:>10.3f}")
+
+
+def bench_shards(args):
+    """p50/p99 single-query latency of thread-pool sharded top-k vs one thread (results checked identical)"""
+    rng = np.random.default_rng(0)
+    print(f"{'n_docs':>10} {'shards':>8} {'p50 ms':>10} {'p99 ms':>10} {'speedup':>8}")
+    for n_docs in args.sizes:
+        docs = _random_unit_rows(rng, n_docs, args.dims, dtype=np.float32)
+        queries = [(q,) for q in _random_unit_rows(rng, args.queries, args.dims, dtype=np.float32)]
+        baseline = None
+        for n_shards in args.shards:
+            with ThreadPoolExecutor(max_workers=n_shards) as executor:
+                def sharded(q):
+                    return sharded_score_top_k(docs, q, args.k, executor, n_shards, chunk_size=args.chunk_size)
+
+                expected_indices, expected_scores = score_top_k(docs, queries[0][0], args.k, chunk_size=args.chunk_size)
+                indices, scores = sharded(queries[0][0])
+                assert np.array_equal(indices, expected_indices) and np.array_equal(scores, expected_scores)
+
+                p50, p99 = _percentiles(_time_calls(sharded, queries))
+            baseline = baseline or p50
+            print(f"{n_docs:>10} {n_shards:>8} {p50:>10.3f} {p99:>10.3f} {baseline / p50:>7.2f}x")
+
+
+def bench_projection(args):
+    """Per-query projection cost: vt.T then np.diag(s) vs the precomputed projection"""
+    rng = np.random.default_rng(0)
+    vt = rng.standard_normal((args.dims, args.vocab))
+    s = np.sort(rng.random(args.dims))[::-1] * 100
+    projection = np.ascontiguousarray((vt.T * s).astype(np.float32))
+
+    queries = []
+    for _ in range(args.queries):
+        cols = rng.choice(args.vocab, size=args.terms, replace=False)
+        data = rng.random(args.terms)
+        queries.append((sp.csr_matrix((data, (np.zeros(args.terms, dtype=int), cols)), shape=(1, args.vocab)),))
+
+    def old_projection(q):
+        return (q @ vt.T) @ np.diag(s)
+
+    def new_projection(q):
+        return q.data @ projection[q.indices]
+
+    print(f"vocab={args.vocab} dims={args.dims} terms/query={args.terms}")
+    print(f"{'method':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, fn in [("vt+diag(s)", old_projection), ("projection", new_projection)]:
+        p50, p99 = _percentiles(_time_calls(fn, queries))
+        print(f"{name:>12} {p50:>10.4f} {p99:>10.4f}")
+
+
+def bench_ann(args):
+    """recall@k and p50/p99 latency of IVF search at several nprobe values vs exact search"""
+    rng = np.random.default_rng(0)
+    docs = _load_or_generate_docs(args, rng)
+    # Queries are perturbed documents, so each has a meaningful neighbourhood
+    picks = docs[np.sort(rng.choice(docs.shape[0], size=args.queries, replace=False))].astype(np.float32)
+    picks += 0.1 * rng.standard_normal(picks.shape).astype(np.float32)
+    queries = [(q / np.linalg.norm(q),) for q in picks]
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        save_ivf_index(docs, args.lists, directory)
+        print(f"n_docs={docs.shape[0]} dims={docs.shape[1]} lists={args.lists} "
+              f"build={time.perf_counter() - start:.2f}s")
+        index = IVFIndex(directory)
+
+        exact = [score_top_k(docs, q, args.k)[0] for (q,) in queries]
+        p50, p99 = _percentiles(_time_calls(lambda q: score_top_k(docs, q, args.k), queries))
+        print(f"{'nprobe':>8} {'recall@k':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        print(f"{'exact':>8} {1.0:>10.3f} {p50:>10.3f} {p99:>10.3f}")
+        for nprobe in args.nprobe:
+            recall = np.mean([
+                _recall(index.search(q, args.k, nprobe=nprobe)[0], expected)
+                for (q,), expected in zip(queries, exact)
+            ])
+            p50, p99 = _percentiles(_time_calls(lambda q: index.search(q, args.k, nprobe=nprobe), queries))
+            print(f"{nprobe:>8} {recall:>10.3f} {p50:>10.3f} {p99:>10.3f}")
+
+
+def bench_pq(args):
+    """recall@k, latency and bytes per document of PQ scoring + exact re-rank vs exact cosine"""
+    rng = np.random.default_rng(0)
+    docs = _load_or_generate_docs(args, rng)
+    picks = docs[np.sort(rng.choice(docs.shape[0], size=args.queries, replace=False))].astype(np.float32)
+    picks += 0.1 * rng.standard_normal(picks.shape).astype(np.float32)
+    queries = [(q / np.linalg.norm(q),) for q in picks]
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        save_pq_index(docs, args.subspaces, directory)
+        print(f"n_docs={docs.shape[0]} dims={docs.shape[1]} subspaces={args.subspaces} "
+              f"build={time.perf_counter() - start:.2f}s")
+        index = PQIndex(directory)
+
+        exact = [score_top_k(docs, q, args.k)[0] for (q,) in queries]
+        p50, p99 = _percentiles(_time_calls(lambda q: score_top_k(docs, q, args.k), queries))
+        print(f"{'rerank':>8} {'bytes/doc':>10} {'recall@k':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        print(f"{'exact':>8} {docs.dtype.itemsize * docs.shape[1]:>10} {1.0:>10.3f} {p50:>10.3f} {p99:>10.3f}")
+        for rerank in args.rerank:
+            recall = np.mean([
+                _recall(index.search(q, args.k, docs, rerank=rerank)[0], expected)
+                for (q,), expected in zip(queries, exact)
+            ])
+            p50, p99 = _percentiles(_time_calls(lambda q: index.search(q, args.k, docs, rerank=rerank), queries))
+            print(f"{rerank:>8} {args.subspaces:>10} {recall:>10.3f} {p50:>10.3f} {p99:>10.3f}")
+
+
+def bench_dense(args):
+    """p50/p99 latency and peak memory of dense fp16 scoring and hybrid fusion vs SVD-only"""
+    rng = np.random.default_rng(0)
+    svd_docs = _random_unit_rows(rng, args.docs, args.svd_dims, dtype=np.float32)
+    if args.embeddings:
+        dense_docs = np.load(args.embeddings, mmap_mode="r")
+    else:
+        # Generated in blocks so the float64 intermediate never covers the whole matrix
+        dense_docs = np.concatenate([
+            _random_unit_rows(rng, min(65_536, args.docs - start), args.dense_dims, dtype=np.float32).astype(np.float16)
+            for start in range(0, args.docs, 65_536)
+        ])
+    queries = [
+        (svd_q, dense_q.astype(np.float32))
+        for svd_q, dense_q in zip(
+            _random_unit_rows(rng, args.queries, svd_docs.shape[1], dtype=np.float32),
+            _random_unit_rows(rng, args.queries, dense_docs.shape[1], dtype=np.float32),
+        )
+    ]
+
+    def hybrid(svd_q, dense_q):
+        svd_indices, _ = score_top_k(svd_docs, svd_q, args.k)
+        dense_indices, _ = score_top_k(dense_docs, dense_q, args.k, chunk_size=args.chunk_size)
+        return reciprocal_rank_fusion([svd_indices, dense_indices])
+
+    methods = {
+        "svd": lambda svd_q, dense_q: score_top_k(svd_docs, svd_q, args.k),
+        "dense-full": lambda svd_q, dense_q: score_top_k(dense_docs, dense_q, args.k),
+        "dense-block": lambda svd_q, dense_q: score_top_k(dense_docs, dense_q, args.k, chunk_size=args.chunk_size),
+        "hybrid-rrf": hybrid,
+    }
+    print(f"n_docs={len(dense_docs)} svd: {svd_docs.shape[1]}x{svd_docs.dtype} "
+          f"({svd_docs.nbytes / 2**20:.0f} MB) dense: {dense_docs.shape[1]}x{dense_docs.dtype} "
+          f"({dense_docs.nbytes / 2**20:.0f} MB)")
+    print(f"{'method':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak MB':>10}")
+    for name, fn in methods.items():
+        p50, p99 = _percentiles(_time_calls(fn, queries))
+        print(f"{name:>12} {p50:>10.3f} {p99:>10.3f} {_peak_allocation_mb(fn, queries[0]):>10.1f}")
+
+
+def _zipf_tfidf_rows(rng, n_rows, n_cols, terms_per_row):
+    """Sparse unit rows whose term frequencies follow a Zipf law, like a TF-IDF matrix"""
+    ranks = np.arange(1, n_cols + 1)
+    term_probs = 1.0 / ranks / np.sum(1.0 / ranks)
+    rows = np.repeat(np.arange(n_rows), terms_per_row)
+    cols = rng.choice(n_cols, size=len(rows), p=term_probs)
+    matrix = sp.csr_matrix((rng.random(len(rows)), (rows, cols)), shape=(n_rows, n_cols))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return sp.csr_matrix(sp.diags(1 / np.maximum(norms, 1e-12)) @ matrix)
+
+
+def bench_svd(args):
+    """Build time, explained variance and singular value error of randomized SVD vs ARPACK svds"""
+    rng = np.random.default_rng(0)
+    if args.matrix:
+        matrix = sp.load_npz(args.matrix).tocsr()
+    else:
+        matrix = _zipf_tfidf_rows(rng, args.docs, args.vocab, args.terms)
+    total_energy = matrix.multiply(matrix).sum()
+    print(f"matrix={matrix.shape[0]}x{matrix.shape[1]} nnz={matrix.nnz}")
+    print(f"{'k':>6} {'solver':>14} {'seconds':>10} {'explained':>10} {'max s err':>10}")
+    for k in args.components:
+        start = time.perf_counter()
+        _, exact_s, _ = svds(matrix, k=k)
+        exact_s = np.sort(exact_s)[::-1]
+        seconds = time.perf_counter() - start
+        print(f"{k:>6} {'arpack':>14} {seconds:>10.2f} {np.sum(exact_s ** 2) / total_energy:>10.1%} {0.0:>10.2e}")
+        for n_iter in args.power_iterations:
+            start = time.perf_counter()
+            _, s, _ = randomized_svd(matrix, k, n_iter=n_iter, n_threads=args.threads)
+            seconds = time.perf_counter() - start
+            error = np.max(np.abs(s - exact_s) / exact_s)
+            print(f"{k:>6} {f'randomized q={n_iter}':>14} {seconds:>10.2f} "
+                  f"{np.sum(s ** 2) / total_energy:>10.1%} {error:>10.2e}")
+
+
+def _synthetic_documents(rng, n_docs, n_words):
+    """Short documents over a Zipf-distributed vocabulary mixing ASCII, accented and CJK words with stop words"""
+    alphabets = ["abcdefghijklmnopqrstuvwxyz", "abcdeéèêëàçïôü", "配信日本語한국어게임"]
+    words = [
+        "".join(rng.choice(list(alphabets[i % 3]), size=rng.integers(2, 9))) for i in range(n_words)
+    ] + sorted(ENGLISH_STOP_WORDS)
+    weights = 1 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    documents = []
+    for _ in range(n_docs):
+        doc_words = rng.choice(words, size=rng.integers(1, 16), p=weights)
+        documents.append(" ".join(word.upper() if rng.random() < 0.1 else word for word in doc_words))
+    return documents
+
+
+def bench_vocabulary(args):
+    """QueryVectorizer vs the fitted sklearn TfidfVectorizer: parity on every document and per-query latency"""
+    rng = np.random.default_rng(0)
+    if args.json:
+        with open(args.json, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        documents = [post["Title"] for posts in data["reddit"].values() for post in posts]
+        documents += [tweet for tweets in data["twitter"].values() for tweet in tweets]
+    else:
+        documents = _synthetic_documents(rng, args.docs, args.words)
+    # Same settings as preprocess_data.TFIDFSVDSearch
+    vectorizer = TfidfVectorizer(stop_words="english", min_df=2, max_df=0.5, ngram_range=(1, 2)).fit(documents)
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_vocabulary(vectorizer, directory)
+        start = time.perf_counter()
+        check_parity(vectorizer, directory, documents)
+        print(f"docs={len(documents)} terms={len(vectorizer.vocabulary_)} parity=ok "
+              f"(checked in {time.perf_counter() - start:.2f}s)")
+
+        query_vectorizer = QueryVectorizer(directory)
+        queries = [([documents[i]],) for i in rng.choice(len(documents), size=args.queries)]
+        print(f"{'vectorizer':>16} {'p50 ms':>10} {'p99 ms':>10}")
+        for name, fn in [("sklearn", vectorizer.transform), ("QueryVectorizer", query_vectorizer.transform)]:
+            p50, p99 = _percentiles(_time_calls(fn, queries))
+            print(f"{name:>16} {p50:>10.4f} {p99:>10.4f}")
+
+
+def bench_live(args):
+    """Throughput and latency of concurrent /live-status card loads against a running live-status service"""
+    names = [str(name) for name in pd.read_csv("streamer_details.csv")["Name"]][:args.streamers]
+    rng = np.random.default_rng(0)
+    # Popular streamers show up on many pages, so card loads repeat names
+    picks = [names[i] for i in rng.zipf(1.5, size=args.requests) % len(names)]
+    sessions = threading.local()
+
+    def load_card(name):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = sessions.session.get(f"{args.url}/live-status", params={"streamer": name}, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    if args.mock_url:
+        requests.delete(f"{args.mock_url}/stats")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(load_card, picks))
+    elapsed = time.perf_counter() - start
+
+    timings = np.array([ms for ms, _ in results])
+    p50, p99 = _percentiles(timings)
+    print(f"requests={args.requests} concurrency={args.concurrency} streamers={len(names)}")
+    print(f"throughput={args.requests / elapsed:.1f} req/s p50={p50:.1f} ms p99={p99:.1f} ms "
+          f"errors={sum(not ok for _, ok in results)}")
+    if args.mock_url:
+        upstream = requests.get(f"{args.mock_url}/stats").json()
+        print(f"upstream calls: {sum(upstream.values())} {upstream}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search backend benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    topk_parser = subparsers.add_parser("topk", help=bench_topk.__doc__)
+    topk_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    topk_parser.add_argument("--dims", type=int, default=30)
+    topk_parser.add_argument("--k", type=int, default=50)
+    topk_parser.add_argument("--queries", type=int, default=200)
+    topk_parser.add_argument("--chunk-size", type=int, default=65_536)
+    topk_parser.set_defaults(func=bench_topk)
+
+    shards_parser = subparsers.add_parser("shards", help=bench_shards.__doc__)
+    shards_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    shards_parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    shards_parser.add_argument("--dims", type=int, default=30)
+    shards_parser.add_argument("--k", type=int, default=1000)
+    shards_parser.add_argument("--queries", type=int, default=50)
+    shards_parser.add_argument("--chunk-size", type=int, default=None)
+    shards_parser.set_defaults(func=bench_shards)
+
+    projection_parser = subparsers.add_parser("projection", help=bench_projection.__doc__)
+    projection_parser.add_argument("--vocab", type=int, default=500_000)
+    projection_parser.add_argument("--dims", type=int, default=30)
+    projection_parser.add_argument("--terms", type=int, default=4)
+    projection_parser.add_argument("--queries", type=int, default=500)
+    projection_parser.set_defaults(func=bench_projection)
+
+    ann_parser = subparsers.add_parser("ann", help=bench_ann.__doc__)
+    ann_parser.add_argument("--models-dir", help="Benchmark a saved docs_compressed.npy instead of synthetic data")
+    ann_parser.add_argument("--docs", type=int, default=1_000_000)
+    ann_parser.add_argument("--dims", type=int, default=30)
+    ann_parser.add_argument("--clusters", type=int, default=200)
+    ann_parser.add_argument("--lists", type=int, default=1024)
+    ann_parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    ann_parser.add_argument("--k", type=int, default=1000)
+    ann_parser.add_argument("--queries", type=int, default=200)
+    ann_parser.set_defaults(func=bench_ann)
+
+    pq_parser = subparsers.add_parser("pq", help=bench_pq.__doc__)
+    pq_parser.add_argument("--models-dir", help="Benchmark a saved docs_compressed.npy instead of synthetic data")
+    pq_parser.add_argument("--docs", type=int, default=1_000_000)
+    pq_parser.add_argument("--dims", type=int, default=30)
+    pq_parser.add_argument("--clusters", type=int, default=200)
+    pq_parser.add_argument("--subspaces", type=int, default=10)
+    pq_parser.add_argument("--rerank", type=int, nargs="+", default=[1, 2, 4, 8])
+    pq_parser.add_argument("--k", type=int, default=1000)
+    pq_parser.add_argument("--queries", type=int, default=100)
+    pq_parser.set_defaults(func=bench_pq)
+
+    dense_parser = subparsers.add_parser("dense", help=bench_dense.__doc__)
+    dense_parser.add_argument("--embeddings", help="Benchmark a saved float16 embedding matrix instead of synthetic data")
+    dense_parser.add_argument("--docs", type=int, default=270_000)
+    dense_parser.add_argument("--svd-dims", type=int, default=30)
+    dense_parser.add_argument("--dense-dims", type=int, default=384)
+    dense_parser.add_argument("--k", type=int, default=1000)
+    dense_parser.add_argument("--queries", type=int, default=50)
+    dense_parser.add_argument("--chunk-size", type=int, default=8192)
+    dense_parser.set_defaults(func=bench_dense)
+
+    svd_parser = subparsers.add_parser("svd", help=bench_svd.__doc__)
+    svd_parser.add_argument("--matrix", help="Benchmark a TF-IDF matrix saved with scipy.sparse.save_npz instead of synthetic data")
+    svd_parser.add_argument("--docs", type=int, default=200_000)
+    svd_parser.add_argument("--vocab", type=int, default=100_000)
+    svd_parser.add_argument("--terms", type=int, default=12)
+    svd_parser.add_argument("--components", type=int, nargs="+", default=[30, 100, 200])
+    svd_parser.add_argument("--power-iterations", type=int, nargs="+", default=[2, 4])
+    svd_parser.add_argument("--threads", type=int, default=None)
+    svd_parser.set_defaults(func=bench_svd)
+
+    vocabulary_parser = subparsers.add_parser("vocabulary", help=bench_vocabulary.__doc__)
+    vocabulary_parser.add_argument("--json", help="Use the reddit titles and tweets of an init.json instead of synthetic documents")
+    vocabulary_parser.add_argument("--docs", type=int, default=20_000)
+    vocabulary_parser.add_argument("--words", type=int, default=20_000)
+    vocabulary_parser.add_argument("--queries", type=int, default=500)
+    vocabulary_parser.set_defaults(func=bench_vocabulary)
+
+    live_parser = subparsers.add_parser("live", help=bench_live.__doc__)
+    live_parser.add_argument("--url", default="http://localhost:5002", help="Live-status service (check_live.py)")
+    live_parser.add_argument("--mock-url", help="mock_helix.py base URL (e.g. http://localhost:5003) to count upstream calls")
+    live_parser.add_argument("--requests", type=int, default=5000)
+    live_parser.add_argument("--concurrency", type=int, default=500)
+    live_parser.add_argument("--streamers", type=int, default=200)
+    live_parser.set_defaults(func=bench_live)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
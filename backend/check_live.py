@@ -1,89 +1,820 @@
 import os
+import queue
+import tempfile
+import threading
+import time
 import requests
+import requests.adapters
 import json
-from flask import Flask, request, jsonify
+import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every worker polls
+    fcntl = None
+
 # Set your Twitch API credentials here:
 TWITCH_CLIENT_ID = "z1akr0fhflhovjnzece9n1yj660c3m"
 TWITCH_OAUTH_TOKEN = "Bearer m64wu8k92wt72wssy1un793gza4m2b"  # Note: No braces around the token value
 
-def get_live_metrics(streamer_name):
+# Helix base URL; point it at mock_helix.py (e.g. http://localhost:5003/helix) to test offline
+HELIX_API_BASE = os.environ.get("HELIX_API_BASE", "https://api.twitch.tv/helix").rstrip("/")
+
+# Helix accepts up to 100 repeated user_login / login parameters per request
+HELIX_MAX_LOGINS = 100
+
+# At most this many Helix requests in flight per process (also the size of
+# the keep-alive connection pool), and the connect / read timeouts
+HELIX_MAX_CONCURRENCY = int(os.environ.get("HELIX_MAX_CONCURRENCY", 32))
+HELIX_TIMEOUT = (3.05, float(os.environ.get("HELIX_TIMEOUT", 5)))
+# Longest a user request waits for a rate-limit point before giving up
+HELIX_MAX_WAIT = float(os.environ.get("HELIX_MAX_WAIT", 1))
+
+# Largest batch /live-status/batch accepts in one request
+MAX_BATCH_STREAMERS = 500
+
+# Background polling of every streamer in streamer_details.csv: live status,
+# viewers and game every LIVE_POLL_INTERVAL seconds (0 disables the poller),
+# follower counts every LIVE_FOLLOWER_INTERVAL seconds. Snapshots older than
+# LIVE_STATUS_MAX_AGE are not served. Only one worker on the host polls (the
+# holder of LIVE_STATUS_SNAPSHOT + ".lock"); it writes the snapshot to
+# LIVE_STATUS_SNAPSHOT, which the other workers serve from
+LIVE_POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL", 60))
+LIVE_FOLLOWER_INTERVAL = float(os.environ.get("LIVE_FOLLOWER_INTERVAL", 900))
+LIVE_STATUS_MAX_AGE = float(os.environ.get("LIVE_STATUS_MAX_AGE", 3 * LIVE_POLL_INTERVAL))
+LIVE_STATUS_SNAPSHOT = os.environ.get(
+    "LIVE_STATUS_SNAPSHOT", os.path.join(tempfile.gettempdir(), "stream-finder-live-status.json")
+)
+
+# Seconds between checks of the snapshot file by workers that do not poll
+LIVE_FOLLOW_INTERVAL = float(os.environ.get("LIVE_FOLLOW_INTERVAL", 2))
+
+# Seconds between keep-alive comments on idle /live-status/stream connections
+LIVE_STREAM_KEEPALIVE = float(os.environ.get("LIVE_STREAM_KEEPALIVE", 15))
+
+# Rate-limit points the poller leaves for user requests; it waits for the
+# bucket to refill rather than spend them
+RATE_LIMIT_RESERVE = int(os.environ.get("RATE_LIMIT_RESERVE", 100))
+
+# Login -> user ID map (seeded from the CSV, extended as logins are resolved)
+# and how long a follower count is served before it is refreshed in the background
+USER_ID_MAP_PATH = os.environ.get(
+    "USER_ID_MAP_PATH", os.path.join(tempfile.gettempdir(), "stream-finder-user-ids.json")
+)
+FOLLOWER_CACHE_TTL = float(os.environ.get("FOLLOWER_CACHE_TTL", 900))
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+csv_path = os.path.join(current_directory, "streamer_details.csv")
+
+# Follower counts have no multi-user endpoint, so they are fetched concurrently
+follower_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("FOLLOWER_FETCH_THREADS", 16)))
+
+
+class RateLimitExceeded(Exception):
+    """The Helix rate-limit bucket would not have a point free in time"""
+
+
+class RateLimit:
+    """Client-side token bucket mirroring Helix's points bucket.
+
+    Helix refills `Ratelimit-Limit` points per minute and reports the
+    current level in Ratelimit-Remaining and the time it will be full in
+    Ratelimit-Reset. Every response re-syncs the bucket; between responses
+    it refills at the same rate, so concurrent callers spread out instead
+    of all hitting 429 at once.
     """
-    Checks if the streamer is live and, if so, gets current viewer count and game name.
-    Also fetches follower count using the user's ID.
-    Returns a dictionary with:
+
+    def __init__(self, window=60):
+        self.window = window
+        self.limit = None
+        self.tokens = None
+        self.updated_at = 0.0
+        self.reset_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return None if self.tokens is None else int(self.tokens)
+
+    def update(self, headers):
+        if "Ratelimit-Remaining" not in headers:
+            return
+        with self.lock:
+            self.limit = int(headers.get("Ratelimit-Limit", 0)) or self.limit
+            self.tokens = float(headers["Ratelimit-Remaining"])
+            self.reset_at = float(headers.get("Ratelimit-Reset", 0))
+            self.updated_at = time.time()
+
+    def _refill(self, now):
+        if now >= self.reset_at:
+            self.tokens = float(self.limit)
+        else:
+            self.tokens = min(float(self.limit), self.tokens + (now - self.updated_at) * self.limit / self.window)
+        self.updated_at = now
+
+    def acquire(self, reserve=0, max_wait=None):
+        """Take one point, waiting while no more than `reserve` are left.
+
+        Raises RateLimitExceeded instead of waiting longer than max_wait.
+        Before Helix has reported a budget, calls are never held back.
+        """
+        deadline = None if max_wait is None else time.time() + max_wait
+        while True:
+            with self.lock:
+                if self.tokens is None or not self.limit:
+                    return
+                now = time.time()
+                self._refill(now)
+                if self.tokens > reserve:
+                    self.tokens -= 1
+                    return
+                delay = min((reserve + 1 - self.tokens) * self.window / self.limit, max(self.reset_at - now, 0))
+            if deadline is not None and now + delay > deadline:
+                raise RateLimitExceeded(f"Helix rate limit exhausted for {delay:.1f}s")
+            time.sleep(max(delay, 0.01))
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls: the first caller runs it, the others share its result"""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.calls[key]
+        return future.result()
+
+
+rate_limit = RateLimit()
+helix_calls = SingleFlight()
+
+helix_slots = threading.BoundedSemaphore(HELIX_MAX_CONCURRENCY)
+helix_session = None
+helix_session_pid = None
+
+
+def get_helix_session():
+    """The process's pooled keep-alive session (sessions are not shared across forks)"""
+    global helix_session, helix_session_pid
+    if helix_session_pid != os.getpid():
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HELIX_MAX_CONCURRENCY)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Client-ID": TWITCH_CLIENT_ID,
+            "Authorization": TWITCH_OAUTH_TOKEN
+        })
+        helix_session, helix_session_pid = session, os.getpid()
+    return helix_session
+
+
+def helix_get(path, params, reserve=None):
+    """GET a Helix endpoint and return the decoded JSON (raises on HTTP errors).
+
+    Identical concurrent calls share one request. Every request takes a
+    point from the rate-limit bucket: background callers (reserve set)
+    wait while no more than `reserve` points are left and retry a 429 once;
+    user-facing calls wait at most HELIX_MAX_WAIT and never retry.
+    """
+    key = (path, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())),
+           reserve is None)
+    return helix_calls.do(key, lambda: _helix_request(path, params, reserve))
+
+
+def _helix_request(path, params, reserve):
+    session = get_helix_session()
+    for attempt in range(2):
+        if reserve is None:
+            rate_limit.acquire(0, max_wait=HELIX_MAX_WAIT)
+        else:
+            rate_limit.acquire(reserve)
+        with helix_slots:
+            response = session.get(f"{HELIX_API_BASE}/{path}", params=params, timeout=HELIX_TIMEOUT)
+        rate_limit.update(response.headers)
+        if response.status_code != 429 or reserve is None:
+            break
+    response.raise_for_status()
+    return response.json()
+
+
+def chunked(items, size):
+    """Split a list into consecutive lists of at most size items"""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def fetch_streams(logins, reserve=None):
+    """Live stream info by lowercase login for up to 100 logins (absent: offline)"""
+    streams_data = helix_get("streams", {"user_login": logins, "first": len(logins)}, reserve)
+    return {live_info.get("user_login", "").lower(): live_info for live_info in streams_data.get("data", [])}
+
+
+def fetch_user_ids(logins, reserve=None):
+    """Twitch user ID by lowercase login for up to 100 logins"""
+    users_data = helix_get("users", {"login": logins}, reserve)
+    return {user.get("login", "").lower(): user.get("id", "") for user in users_data.get("data", [])}
+
+
+def fetch_follower_count(user_id, reserve=None):
+    # 'first' parameter is not actually used for count
+    follows_data = helix_get("users/follows", {"to_id": user_id, "first": 1}, reserve)
+    return follows_data.get("total", 0)
+
+
+def stream_metrics(live_info, follower_count):
+    return {
+        "is_live": live_info is not None,
+        "viewer_count": live_info.get("viewer_count", 0) if live_info else 0,
+        "game_name": live_info.get("game_name", "") if live_info else "",
+        "follower_count": follower_count
+    }
+
+
+def hit_rate(hits, total):
+    return hits / total if total else None
+
+
+class UserIdMap:
+    """Persistent login -> Twitch user ID map.
+
+    A login's ID never changes, so each is looked up through /helix/users
+    at most once: the map starts from streamer_details.csv's ID column plus
+    whatever earlier runs saved to `path`, and new IDs are saved as they
+    are resolved.
+    """
+
+    def __init__(self, seed, path=None):
+        self.ids = dict(seed)
+        self.path = path
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.ids.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable user ID map {path}: {e}")
+
+    def resolve(self, logins, reserve=None):
+        """User IDs by lowercase login; unknown logins are looked up 100 per call (absent if that fails)"""
+        with self.lock:
+            known = {login: self.ids[login] for login in logins if login in self.ids}
+            self.hits += len(known)
+            self.misses += len(logins) - len(known)
+        found = {}
+        for batch in chunked([login for login in logins if login not in known], HELIX_MAX_LOGINS):
+            try:
+                found.update(fetch_user_ids(batch, reserve))
+            except Exception as e:
+                print(f"Error fetching user IDs for {len(batch)} streamers: {e}")
+        if found:
+            with self.lock:
+                self.ids.update(found)
+                ids = dict(self.ids)
+            if self.path:
+                write_json_atomic(ids, self.path)
+        return {**known, **found}
+
+    def stats(self):
+        return {"size": len(self.ids), "hits": self.hits, "misses": self.misses,
+                "hit_rate": hit_rate(self.hits, self.hits + self.misses)}
+
+
+class FollowerCache:
+    """Follower counts by user ID, fresh for `ttl` seconds.
+
+    An expired count is still returned while a background refresh fetches
+    the new one, so only user IDs never seen before cost a Helix call on
+    the request path. Failed fetches are not cached.
+    """
+
+    def __init__(self, ttl, reserve=RATE_LIMIT_RESERVE):
+        self.ttl = ttl
+        self.reserve = reserve
+        self.entries = {}  # user ID -> (count, fetched_at)
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="follower-refresh")
+
+    def put(self, user_id, count):
+        with self.lock:
+            self.entries[user_id] = (count, time.time())
+
+    def get_many(self, user_ids):
+        """Follower count by user ID; IDs not cached yet are fetched concurrently (0 on failure)"""
+        now = time.time()
+        counts = {}
+        stale = []
+        with self.lock:
+            for user_id in user_ids:
+                entry = self.entries.get(user_id)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                counts[user_id] = entry[0]
+                if now - entry[1] < self.ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    stale.append(user_id)
+        for user_id in stale:
+            self._refresh_in_background(user_id)
+        missing = [user_id for user_id in user_ids if user_id not in counts]
+        for user_id, count in zip(missing, follower_executor.map(self.fetch, missing)):
+            counts[user_id] = 0 if count is None else count
+        return counts
+
+    def fetch(self, user_id, reserve=None):
+        """Fetch and cache one count; None if the call failed"""
+        try:
+            count = fetch_follower_count(user_id, reserve)
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+            print(f"Error fetching follower count for user {user_id}: {e}")
+            return None
+        self.put(user_id, count)
+        return count
+
+    def _refresh_in_background(self, user_id):
+        with self.lock:
+            if user_id in self.refreshing:
+                return
+            self.refreshing.add(user_id)
+        self._refresh_executor.submit(self._refresh, user_id)
+
+    def _refresh(self, user_id):
+        try:
+            self.fetch(user_id, self.reserve)
+        finally:
+            with self.lock:
+                self.refreshing.discard(user_id)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "stale_hits": self.stale_hits,
+                "misses": self.misses, "errors": self.errors, "refreshing": len(self.refreshing),
+                "hit_rate": hit_rate(self.hits + self.stale_hits, lookups)}
+
+
+def load_streamer_ids(path):
+    """Twitch user IDs by lowercase login from streamer_details.csv's ID column"""
+    details = pd.read_csv(path)
+    return {
+        str(name).lower().strip(): str(int(user_id))
+        for name, user_id in zip(details["Name"], details["ID"])
+        if str(name).strip() and pd.notna(user_id)
+    }
+
+
+user_id_map = UserIdMap(load_streamer_ids(csv_path), USER_ID_MAP_PATH)
+follower_cache = FollowerCache(FOLLOWER_CACHE_TTL)
+
+
+def get_live_metrics_batch(streamer_names):
+    """
+    Live metrics for many streamers with as few Helix calls as possible:
+    one /streams call per 100 logins; user IDs come from user_id_map and
+    follower counts from follower_cache, so known streamers need nothing else.
+    Returns a dict mapping each given name to a dictionary with:
       - is_live (bool)
       - viewer_count (int, if live; else 0)
       - game_name (str)
       - follower_count (int)
+    A failed Helix call only blanks the fields it would have filled.
     """
-    # Twitch API endpoint for live streams
-    streams_url = "https://api.twitch.tv/helix/streams"
-    streams_params = {"user_login": streamer_name.lower()}
-    headers = {
-        "Client-ID": TWITCH_CLIENT_ID,
-        "Authorization": TWITCH_OAUTH_TOKEN
-    }
-    try:
-        streams_response = requests.get(streams_url, params=streams_params, headers=headers, timeout=10)
-        streams_response.raise_for_status()
-        streams_data = streams_response.json()
-    except Exception as e:
-        print(f"Error checking live status for {streamer_name}: {e}")
-        return {"is_live": False, "viewer_count": 0, "game_name": "", "follower_count": 0}
-
-    is_live = len(streams_data.get("data", [])) > 0
-    viewer_count = 0
-    game_name = ""
-    if is_live:
-        live_info = streams_data["data"][0]
-        viewer_count = live_info.get("viewer_count", 0)
-        game_name = live_info.get("game_name", "")
-    
-    # Get user ID to fetch follower count
-    users_url = "https://api.twitch.tv/helix/users"
-    users_params = {"login": streamer_name.lower()}
-    try:
-        users_response = requests.get(users_url, params=users_params, headers=headers, timeout=10)
-        users_response.raise_for_status()
-        users_data = users_response.json()
-        user_id = users_data.get("data", [{}])[0].get("id", "")
-    except Exception as e:
-        print(f"Error fetching user ID for {streamer_name}: {e}")
-        user_id = ""
-
-    follower_count = 0
-    if user_id:
-        follows_url = "https://api.twitch.tv/helix/users/follows"
-        follows_params = {"to_id": user_id, "first": 1}  # 'first' parameter is not actually used for count
+    logins = list(dict.fromkeys(name.lower() for name in streamer_names))
+    streams = {}
+    for batch in chunked(logins, HELIX_MAX_LOGINS):
         try:
-            follows_response = requests.get(follows_url, params=follows_params, headers=headers, timeout=10)
-            follows_response.raise_for_status()
-            follows_data = follows_response.json()
-            follower_count = follows_data.get("total", 0)
+            streams.update(fetch_streams(batch))
         except Exception as e:
-            print(f"Error fetching follower count for {streamer_name}: {e}")
+            print(f"Error checking live status for {len(batch)} streamers: {e}")
 
+    user_ids = user_id_map.resolve(logins)
+    follower_counts = follower_cache.get_many(list(dict.fromkeys(user_ids.values())))
     return {
-        "is_live": is_live,
-        "viewer_count": viewer_count,
-        "game_name": game_name,
-        "follower_count": follower_count
+        name: stream_metrics(streams.get(name.lower()), follower_counts.get(user_ids.get(name.lower()), 0))
+        for name in streamer_names
     }
 
+
+def get_live_metrics(streamer_name):
+    """
+    Checks if the streamer is live and, if so, gets current viewer count and game name.
+    Also fetches follower count using the user's ID.
+    Returns the same dictionary as one entry of get_live_metrics_batch.
+    """
+    return get_live_metrics_batch([streamer_name])[streamer_name]
+
+
+class LiveSnapshot:
+    """Immutable live metrics for many streamers, keyed by lowercase login"""
+
+    def __init__(self, metrics, fetched_at):
+        self.metrics = metrics
+        self.fetched_at = fetched_at
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+def load_snapshot(path):
+    """Read a snapshot saved by LiveStatusPoller, or None if there is no usable one"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return LiveSnapshot(data["streamers"], float(data["fetched_at"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_snapshot(snapshot, path):
+    write_json_atomic({"fetched_at": snapshot.fetched_at, "streamers": snapshot.metrics}, path)
+
+
+def write_json_atomic(data, path):
+    """Write JSON to a unique temp file next to path and move it into place.
+
+    Several worker processes may write the same file (the user ID map, or a
+    poller taking over from one that died), so writers never share a temp
+    file; readers only ever see a complete file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class LiveStatusBroadcaster:
+    """Fans snapshot changes out to streaming clients.
+
+    Each published snapshot is diffed against the previous one once, and
+    the changed streamers are routed through a login -> subscribers index.
+    A publish therefore costs O(changed streamers + deliveries), no matter
+    how many clients are connected or how many cards each one shows.
+    Every subscriber gets one {login: metrics} dict per publish that
+    touched its streamers.
+    """
+
+    def __init__(self):
+        self.subscribers_by_login = {}
+        self.subscribers = 0
+        self.lock = threading.Lock()
+
+    def subscribe(self, logins):
+        updates = queue.Queue()
+        with self.lock:
+            for login in logins:
+                self.subscribers_by_login.setdefault(login, set()).add(updates)
+            self.subscribers += 1
+        return updates
+
+    def unsubscribe(self, updates, logins):
+        with self.lock:
+            for login in logins:
+                subscribers = self.subscribers_by_login.get(login)
+                if subscribers is not None:
+                    subscribers.discard(updates)
+                    if not subscribers:
+                        del self.subscribers_by_login[login]
+            self.subscribers -= 1
+
+    def publish(self, previous, snapshot):
+        changed = {
+            login: metrics for login, metrics in snapshot.metrics.items()
+            if previous.metrics.get(login) != metrics
+        }
+        deliveries = {}
+        with self.lock:
+            for login, metrics in changed.items():
+                for updates in self.subscribers_by_login.get(login, ()):
+                    deliveries.setdefault(updates, {})[login] = metrics
+        for updates, update in deliveries.items():
+            updates.put(update)
+
+
+class LiveStatusPoller:
+    """Background thread that keeps a LiveSnapshot of many streamers fresh.
+
+    Each cycle costs one /streams call per 100 streamers; follower counts
+    (one call per streamer) are refreshed only every follower_interval
+    seconds. All calls keep `reserve` rate-limit points free for user
+    requests. Every cycle builds a new snapshot and swaps it in with one
+    assignment, so readers never see a half-updated one. Streamers whose
+    batch failed keep their previous metrics.
+
+    With a snapshot_path, the pollers of all worker processes elect one
+    leader through an flock on snapshot_path + ".lock". Only the leader
+    calls Helix; the others reload the snapshot file whenever it changes
+    (every follow_interval seconds) and take over if the leader exits.
+    """
+
+    def __init__(self, streamer_names, interval, follower_interval, snapshot_path=None,
+                 reserve=RATE_LIMIT_RESERVE, broadcaster=None, follow_interval=LIVE_FOLLOW_INTERVAL):
+        self.logins = list(dict.fromkeys(name.lower() for name in streamer_names))
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.follower_interval = follower_interval
+        self.snapshot_path = snapshot_path
+        self.reserve = reserve
+        self.follow_interval = follow_interval
+        self.snapshot = (load_snapshot(snapshot_path) if snapshot_path else None) or LiveSnapshot({}, 0.0)
+        self._lock_file = None
+        self._snapshot_mtime = None
+        self.followers_at = 0.0
+        # Logins whose follower count failed to refresh; retried every cycle
+        self.stale_followers = set()
+        self.cycles = 0
+        self.last_cycle_seconds = None
+        self.last_error = None
+        self._thread = None
+        # Separate from follower_executor so rate-limit waits never queue user requests
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="live-status-followers")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="live-status-poller", daemon=True)
+        self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_leader(self):
+        return self._lock_file is not None or not self.snapshot_path or fcntl is None
+
+    def try_lead(self):
+        """Take the poller lock without waiting; True if this process polls Helix"""
+        if self.is_leader:
+            return True
+        lock_file = open(self.snapshot_path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits, when the kernel releases it
+        self._lock_file = lock_file
+        self.follow()
+        return True
+
+    def follow(self):
+        """Publish the leader's snapshot from disk if the file changed since the last check"""
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._snapshot_mtime:
+            return
+        snapshot = load_snapshot(self.snapshot_path)
+        if snapshot is not None:
+            self._snapshot_mtime = mtime
+            self.publish(snapshot, save=False)
+
+    def poll_once(self):
+        start_time = time.time()
+        previous = self.snapshot.metrics
+        errors = []
+
+        metrics = {}
+        batches = chunked(self.logins, HELIX_MAX_LOGINS)
+        failed_batches = 0
+        for batch in batches:
+            try:
+                streams = fetch_streams(batch, self.reserve)
+            except Exception as e:
+                errors.append(f"streams: {e}")
+                failed_batches += 1
+                metrics.update((login, previous[login]) for login in batch if login in previous)
+                continue
+            for login in batch:
+                follower_count = previous.get(login, {}).get("follower_count", 0)
+                metrics[login] = stream_metrics(streams.get(login), follower_count)
+        # A cycle that refreshed nothing keeps the old snapshot, so its age shows the outage
+        if failed_batches < len(batches):
+            self.publish(LiveSnapshot(metrics, time.time()))
+
+        # Follower counts take one call per streamer and may have to wait for
+        # the rate limit, so they are merged into the published snapshot afterwards
+        if start_time - self.followers_at >= self.follower_interval:
+            self.followers_at = start_time
+            self.refresh_followers(self.logins, errors)
+        elif self.stale_followers:
+            self.refresh_followers([login for login in self.logins if login in self.stale_followers], errors)
+
+        self.cycles += 1
+        self.last_cycle_seconds = time.time() - start_time
+        self.last_error = errors[-1] if errors else None
+
+    def refresh_followers(self, logins, errors):
+        user_ids = user_id_map.resolve(logins, self.reserve)
+        n_failed = 0
+        # Published 100 streamers at a time, so a cold start fills in progressively
+        for batch in chunked(list(user_ids), HELIX_MAX_LOGINS):
+            counts = dict(zip(batch, self._executor.map(self._follower_count, [user_ids[login] for login in batch])))
+            failed = {login for login, count in counts.items() if count is None}
+            self.stale_followers = (self.stale_followers - set(counts)) | failed
+            n_failed += len(failed)
+
+            current = self.snapshot
+            metrics = dict(current.metrics)
+            for login, count in counts.items():
+                if count is not None and login in metrics:
+                    metrics[login] = {**metrics[login], "follower_count": count}
+            self.publish(LiveSnapshot(metrics, current.fetched_at))
+        if n_failed:
+            errors.append(f"follows: {n_failed} follower counts could not be fetched")
+
+    def _follower_count(self, user_id):
+        """Follower count (also stored in follower_cache), or None if it could not be fetched"""
+        return follower_cache.fetch(user_id, self.reserve) if user_id else None
+
+    def publish(self, snapshot, save=True):
+        previous, self.snapshot = self.snapshot, snapshot
+        if self.broadcaster is not None:
+            self.broadcaster.publish(previous, snapshot)
+        if save and self.snapshot_path:
+            try:
+                save_snapshot(snapshot, self.snapshot_path)
+            except OSError as e:  # the in-memory snapshot is already live
+                print(f"Could not save live status snapshot to {self.snapshot_path}: {e}")
+
+    def _run(self):
+        while True:
+            start_time = time.time()
+            interval = self.follow_interval
+            try:
+                if self.try_lead():
+                    interval = self.interval
+                    self.poll_once()
+                else:
+                    self.follow()
+            except Exception as e:  # keep polling; the last snapshot stays in place
+                self.last_error = str(e)
+                print(f"Live status poll failed: {e}")
+            time.sleep(max(interval - (time.time() - start_time), 0))
+
+
+def load_streamer_names(path):
+    """Names of all streamers in streamer_details.csv"""
+    return [str(name).strip() for name in pd.read_csv(path)["Name"] if str(name).strip()]
+
+
+live_poller = None
+live_poller_pid = None
+live_updates = LiveStatusBroadcaster()
+
+
+def live_metrics(streamer_names):
+    """Metrics for each name, from the poller's snapshot when it is fresh and has the streamer"""
+    snapshot = live_poller.snapshot if live_poller is not None else None
+    if snapshot is None or snapshot.age() > LIVE_STATUS_MAX_AGE:
+        return get_live_metrics_batch(streamer_names)
+    metrics = {name: snapshot.metrics[name.lower()] for name in streamer_names if name.lower() in snapshot.metrics}
+    missing = [name for name in streamer_names if name not in metrics]
+    if missing:
+        metrics.update(get_live_metrics_batch(missing))
+    return metrics
+
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def ensure_live_poller():
+    """Start the background poller lazily, once per worker process"""
+    global live_poller, live_poller_pid
+    if LIVE_POLL_INTERVAL <= 0:
+        return
+    if live_poller_pid != os.getpid() or not live_poller.is_alive():
+        live_poller_pid = os.getpid()
+        live_poller = LiveStatusPoller(
+            load_streamer_names(csv_path), LIVE_POLL_INTERVAL, LIVE_FOLLOWER_INTERVAL,
+            snapshot_path=LIVE_STATUS_SNAPSHOT, broadcaster=live_updates
+        ).start()
+
 @app.route("/live-status", methods=["GET"])
 def live_status_endpoint():
     streamer = request.args.get("streamer", "")
     if not streamer:
         return jsonify({"error": "No streamer provided"}), 400
-    metrics = get_live_metrics(streamer)
+    metrics = live_metrics([streamer])[streamer]
     # Return the metrics along with the streamer name.
     return jsonify({"streamer": streamer, **metrics})
 
+@app.route("/live-status/batch", methods=["GET", "POST"])
+def live_status_batch_endpoint():
+    """Metrics for many streamers in one request: ?streamers=a,b,c or {"streamers": [...]}"""
+    if request.method == "POST":
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, dict):
+            return jsonify({"error": "body must be a JSON object"}), 400
+        streamers = payload.get("streamers", [])
+        if not isinstance(streamers, list) or not all(isinstance(s, str) for s in streamers):
+            return jsonify({"error": "streamers must be a list of strings"}), 400
+    else:
+        streamers = request.args.get("streamers", "").split(",")
+    streamers = list(dict.fromkeys(s.strip() for s in streamers if s.strip()))
+    if not streamers:
+        return jsonify({"error": "No streamers provided"}), 400
+    if len(streamers) > MAX_BATCH_STREAMERS:
+        return jsonify({"error": f"At most {MAX_BATCH_STREAMERS} streamers per request"}), 400
+    metrics = live_metrics(streamers)
+    return jsonify([{"streamer": streamer, **metrics[streamer]} for streamer in streamers])
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/live-status/stream")
+def live_status_stream():
+    """Server-sent events for ?streamers=a,b,c: one "snapshot" event, then "delta" events.
+
+    Deltas list only the streamers whose metrics changed (went live or
+    offline, viewers, game or followers), in the /live-status/batch
+    format, as the shared poller publishes them.
+    """
+    streamers = list(dict.fromkeys(s.strip() for s in request.args.get("streamers", "").split(",") if s.strip()))
+    if not streamers:
+        return jsonify({"error": "No streamers provided"}), 400
+    if len(streamers) > MAX_BATCH_STREAMERS:
+        return jsonify({"error": f"At most {MAX_BATCH_STREAMERS} streamers per request"}), 400
+    names = {streamer.lower(): streamer for streamer in streamers}
+
+    def events():
+        # Subscribe before reading the current state so no change falls in between
+        updates = live_updates.subscribe(names)
+        try:
+            metrics = live_metrics(streamers)
+            yield sse_event("snapshot", [{"streamer": streamer, **metrics[streamer]} for streamer in streamers])
+            while True:
+                try:
+                    changed = updates.get(timeout=LIVE_STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                # A slow client gets everything queued since its last event as one delta
+                while True:
+                    try:
+                        changed.update(updates.get_nowait())
+                    except queue.Empty:
+                        break
+                yield sse_event("delta", [{"streamer": names[login], **entry} for login, entry in changed.items()])
+        finally:
+            live_updates.unsubscribe(updates, names)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/live-status/stats")
+def live_status_stats():
+    """Snapshot age, poller health and user ID / follower cache hit rates"""
+    poller = live_poller
+    return jsonify({
+        "poller_running": poller is not None and poller.is_alive(),
+        "poller_role": (("leader" if poller.is_leader else "follower") if poller else None),
+        "snapshot_age_seconds": poller.snapshot.age() if poller and poller.snapshot.fetched_at else None,
+        "snapshot_streamers": len(poller.snapshot.metrics) if poller else 0,
+        "cycles": poller.cycles if poller else 0,
+        "last_cycle_seconds": poller.last_cycle_seconds if poller else None,
+        "last_error": poller.last_error if poller else None,
+        "rate_limit_remaining": rate_limit.remaining,
+        "coalesced_helix_calls": helix_calls.coalesced,
+        "stream_subscribers": live_updates.subscribers,
+        "user_id_map": user_id_map.stats(),
+        "follower_cache": follower_cache.stats()
+    })
+
 if __name__ == "__main__":
     # Run this service on port 5002
     app.run(debug=True, host="0.0.0.0", port=5002)
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+
+from topk import score_top_k
+
+# Sentence embeddings of the documents, float16 [n_rows, dim], L2-normalized
+EMBEDDINGS_FILE = "embeddings_fp16.npy"
+# Optional int32 [n_rows] document index of every embedding row; without it
+# row i must be document i
+EMBEDDING_DOC_IDS_FILE = "embedding_doc_ids.npy"
+
+DEFAULT_ENCODER = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def load_encoder(model_name=DEFAULT_ENCODER, offline=True):
+    """Load a sentence-transformers model on CPU, or return None if that is not possible.
+
+    With offline=True only locally cached (or local path) models are used,
+    so the server never downloads weights at startup. sentence-transformers
+    (and torch with it) is only imported here, so servers without an
+    embeddings file never pay for it.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("Dense retrieval disabled: sentence-transformers is not installed")
+        return None
+    try:
+        return SentenceTransformer(model_name, device="cpu", local_files_only=offline)
+    except Exception as e:  # missing weights, bad path, incompatible version...
+        print(f"Dense retrieval disabled: could not load encoder {model_name!r}: {e}")
+        return None
+
+
+def encode(encoder, texts, batch_size=64):
+    """Return float32 [len(texts), dim] unit vectors for the texts"""
+    vectors = encoder.encode(
+        list(texts), batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def save_embeddings(encoder, texts, directory, batch_size=1024):
+    """Encode documents in order and write them as EMBEDDINGS_FILE (float16).
+
+    Rows are written block by block into a memory-mapped .npy, so the full
+    float32 matrix never has to exist in memory.
+    """
+    dim = encoder.get_sentence_embedding_dimension()
+    path = os.path.join(directory, EMBEDDINGS_FILE)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float16, shape=(len(texts), dim))
+    for start in range(0, len(texts), batch_size):
+        out[start:start + batch_size] = encode(encoder, texts[start:start + batch_size])
+    out.flush()
+    del out
+
+
+class DenseIndex:
+    """Memory-mapped float16 document embeddings for dense retrieval.
+
+    Storage stays float16; scoring widens one block of rows at a time and
+    accumulates in float32 (see topk.score_top_k), so a query never
+    materializes a float32 copy of the whole matrix.
+    """
+
+    def __init__(self, path, n_docs, chunk_size=8192):
+        try:
+            self.embeddings = np.load(path, mmap_mode="r")
+        except ValueError:
+            # e.g. a git-lfs pointer checked out without `git lfs pull`
+            raise ValueError(f"{path} is not a .npy array") from None
+        if self.embeddings.ndim != 2:
+            raise ValueError(f"{path} is not a 2-D embedding matrix")
+        self.chunk_size = chunk_size
+
+        doc_ids_path = os.path.join(os.path.dirname(path), EMBEDDING_DOC_IDS_FILE)
+        if os.path.isfile(doc_ids_path):
+            self.doc_ids = np.load(doc_ids_path)
+            if len(self.doc_ids) != len(self.embeddings):
+                raise ValueError(f"{doc_ids_path} does not match the rows of {path}")
+        elif len(self.embeddings) == n_docs:
+            self.doc_ids = None
+        else:
+            raise ValueError(
+                f"{path} has {len(self.embeddings)} rows for {n_docs} documents "
+                f"and no {EMBEDDING_DOC_IDS_FILE} mapping them"
+            )
+
+        # Document index -> embedding row (-1 for documents without one)
+        if self.doc_ids is None:
+            self.rows = None
+        else:
+            self.rows = np.full(n_docs, -1, dtype=np.int64)
+            self.rows[self.doc_ids] = np.arange(len(self.doc_ids))
+
+    @property
+    def dim(self):
+        return self.embeddings.shape[1]
+
+    def search(self, query_vec, k):
+        """Return (doc indices, scores) of the k most similar documents, best first"""
+        rows, scores = score_top_k(self.embeddings, query_vec, k, chunk_size=self.chunk_size)
+        return (rows if self.doc_ids is None else self.doc_ids[rows].astype(np.intp)), scores
+
+    def scores(self, doc_indices, query_vec):
+        """Return the cosine score of each document (0 for documents without an embedding)"""
+        query_vec = np.asarray(query_vec, dtype=np.float32)
+        doc_indices = np.asarray(doc_indices, dtype=np.intp)
+        if self.rows is None:
+            return self.embeddings[doc_indices].astype(np.float32) @ query_vec
+        rows = self.rows[doc_indices]
+        scores = np.zeros(len(doc_indices), dtype=np.float32)
+        present = rows >= 0
+        scores[present] = self.embeddings[rows[present]].astype(np.float32) @ query_vec
+        return scores
@@ -0,0 +1,141 @@
+import json
+import os
+
+import numpy as np
+
+from string_table import StringTable, append_string_table, save_string_table
+
+# Integer source codes stored per document
+SOURCES = ("reddit", "twitter", "wiki", "details")
+SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+
+SNIPPET_LENGTH = 150
+
+# On-disk layout of a saved document store (all inside the models directory)
+STREAMERS_FILE = "streamers.json"              # streamer id -> name
+SOURCES_FILE = "doc_sources.npy"               # int8 [n_docs] source codes
+STREAMER_IDS_FILE = "doc_streamer_ids.npy"     # int32 [n_docs] streamer ids
+REDDIT_SCORES_FILE = "doc_reddit_scores.npy"   # int64 [n_docs] (0 for non-reddit docs)
+REDDIT_IDS_FILES = ("doc_reddit_ids.npy", "doc_reddit_id_offsets.npy")
+SNIPPETS_FILES = ("doc_snippets.npy", "doc_snippet_offsets.npy")
+
+
+def make_snippet(text):
+    """Truncate a document to the snippet shown in search results"""
+    return text[:SNIPPET_LENGTH] + "..." if len(text) > SNIPPET_LENGTH else text
+
+
+def document_text(source, data):
+    """Return the display text of a raw document from one of the data sources"""
+    if source == "reddit":
+        return data["Title"]
+    if source == "twitter":
+        return data
+    if source == "wiki":
+        return data["wikipedia_summary"] if isinstance(data, dict) else str(data)
+    return str(data.get("Description", ""))
+
+
+def _doc_columns(doc_lookup, streamer_ids):
+    """Build the store's columns for a {doc_idx: (source, streamer, idx, data)} lookup.
+
+    streamer_ids (name -> id) is extended in place with unseen streamers.
+    """
+    n_docs = len(doc_lookup)
+    sources = np.zeros(n_docs, dtype=np.int8)
+    doc_streamer_ids = np.zeros(n_docs, dtype=np.int32)
+    reddit_scores = np.zeros(n_docs, dtype=np.int64)
+    reddit_ids = []
+    snippets = []
+
+    for doc_idx in range(n_docs):
+        source, streamer, _, data = doc_lookup[doc_idx]
+        sources[doc_idx] = SOURCE_CODES[source]
+        doc_streamer_ids[doc_idx] = streamer_ids.setdefault(streamer, len(streamer_ids))
+        if source == "reddit":
+            reddit_scores[doc_idx] = int(data["Score"])
+            reddit_ids.append(str(data["ID"]))
+        else:
+            reddit_ids.append("")
+        snippets.append(make_snippet(document_text(source, data)))
+    return sources, doc_streamer_ids, reddit_scores, reddit_ids, snippets
+
+
+def save_doc_store(doc_lookup, directory):
+    """Save a {doc_idx: (source, streamer, idx, data)} lookup as a columnar store.
+
+    Only what search results display is kept: source, streamer, the reddit
+    score and id, and a 150-character snippet of the text. Returns the
+    per-document streamer ids and the number of streamers.
+    """
+    streamer_ids = {}
+    sources, doc_streamer_ids, reddit_scores, reddit_ids, snippets = _doc_columns(doc_lookup, streamer_ids)
+
+    with open(os.path.join(directory, STREAMERS_FILE), "w", encoding="utf-8") as f:
+        json.dump(list(streamer_ids), f)
+    np.save(os.path.join(directory, SOURCES_FILE), sources)
+    np.save(os.path.join(directory, STREAMER_IDS_FILE), doc_streamer_ids)
+    np.save(os.path.join(directory, REDDIT_SCORES_FILE), reddit_scores)
+    save_string_table(*(os.path.join(directory, name) for name in REDDIT_IDS_FILES), reddit_ids)
+    save_string_table(*(os.path.join(directory, name) for name in SNIPPETS_FILES), snippets)
+    return doc_streamer_ids, len(streamer_ids)
+
+
+def append_doc_store(doc_lookup, directory):
+    """Append a {0..n-1: (source, streamer, idx, data)} lookup to a saved store.
+
+    New documents get the indices following the existing ones; new streamers
+    get new ids. Returns the per-document streamer ids of the whole store
+    and the number of streamers.
+    """
+    with open(os.path.join(directory, STREAMERS_FILE), "r", encoding="utf-8") as f:
+        streamer_ids = {name: streamer_id for streamer_id, name in enumerate(json.load(f))}
+    sources, doc_streamer_ids, reddit_scores, reddit_ids, snippets = _doc_columns(doc_lookup, streamer_ids)
+
+    # Arrays are read fully before being rewritten (never through a mmap of the file itself)
+    columns = [(SOURCES_FILE, sources), (STREAMER_IDS_FILE, doc_streamer_ids), (REDDIT_SCORES_FILE, reddit_scores)]
+    for name, new_values in columns:
+        path = os.path.join(directory, name)
+        np.save(path, np.concatenate([np.load(path), new_values]))
+    append_string_table(*(os.path.join(directory, name) for name in REDDIT_IDS_FILES), reddit_ids)
+    append_string_table(*(os.path.join(directory, name) for name in SNIPPETS_FILES), snippets)
+    with open(os.path.join(directory, STREAMERS_FILE), "w", encoding="utf-8") as f:
+        json.dump(list(streamer_ids), f)
+    return np.load(os.path.join(directory, STREAMER_IDS_FILE)), len(streamer_ids)
+
+
+class DocStore:
+    """Memory-mapped columnar document store, sliced only for the top-k hits"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, STREAMERS_FILE), "r", encoding="utf-8") as f:
+            self.streamer_names = json.load(f)
+        self.sources = np.load(os.path.join(directory, SOURCES_FILE), mmap_mode="r")
+        self.streamer_ids = np.load(os.path.join(directory, STREAMER_IDS_FILE), mmap_mode="r")
+        self.reddit_scores = np.load(os.path.join(directory, REDDIT_SCORES_FILE), mmap_mode="r")
+        self.reddit_ids = StringTable(*(os.path.join(directory, name) for name in REDDIT_IDS_FILES))
+        self.snippets = StringTable(*(os.path.join(directory, name) for name in SNIPPETS_FILES))
+
+    def __len__(self):
+        return len(self.sources)
+
+    def get_documents(self, doc_indices):
+        """Return (source, streamer, snippet, reddit_score, reddit_id) for each document"""
+        doc_indices = np.asarray(doc_indices, dtype=np.intp)
+        sources = self.sources[doc_indices].tolist()
+        streamer_ids = self.streamer_ids[doc_indices].tolist()
+        reddit_scores = self.reddit_scores[doc_indices].tolist()
+
+        documents = []
+        for doc_idx, source_code, streamer_id, reddit_score in zip(
+            doc_indices.tolist(), sources, streamer_ids, reddit_scores
+        ):
+            source = SOURCES[source_code]
+            documents.append((
+                source,
+                self.streamer_names[streamer_id],
+                self.snippets.get_str(doc_idx),
+                reddit_score,
+                self.reddit_ids.get_str(doc_idx) if source == "reddit" else None,
+            ))
+        return documents
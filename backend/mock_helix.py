@@ -0,0 +1,143 @@
+"""Local stand-in for the Twitch Helix endpoints check_live.py uses.
+
+Serves /helix/streams, /helix/users and /helix/users/follows with
+deterministic fake data (real IDs from streamer_details.csv where known),
+enforces Helix's 100-logins-per-request limit and counts requests per
+endpoint, so the live-status service can be exercised offline:
+
+    python mock_helix.py
+    HELIX_API_BASE=http://localhost:5003/helix python check_live.py
+    curl "http://localhost:5002/live-status/batch?streamers=KAICENAT,CAEDREL"
+    curl http://localhost:5003/stats
+
+MOCK_HELIX_LATENCY_MS adds a fixed delay to every response, and
+MOCK_HELIX_RATE_LIMIT sets the points per MOCK_HELIX_RATE_WINDOW seconds
+(default 800 per 60, like an app access token); responses carry
+Ratelimit-* headers and a drained bucket answers 429.
+"""
+import math
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+
+import pandas as pd
+from flask import Flask, request, jsonify
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+
+MAX_LOGINS = 100
+GAMES = ["Just Chatting", "League of Legends", "VALORANT", "Minecraft", "Grand Theft Auto V", "Fortnite"]
+
+latency = float(os.environ.get("MOCK_HELIX_LATENCY_MS", 0)) / 1000
+rate_limit = int(os.environ.get("MOCK_HELIX_RATE_LIMIT", 800))
+rate_window = float(os.environ.get("MOCK_HELIX_RATE_WINDOW", 60))
+
+# Twitch user IDs by lowercase login, taken from the CSV's ID column
+known_ids = {}
+csv_path = os.path.join(current_directory, "streamer_details.csv")
+if os.path.isfile(csv_path):
+    for _, row in pd.read_csv(csv_path).fillna("").iterrows():
+        if str(row["ID"]).strip():
+            known_ids[str(row["Name"]).lower().strip()] = str(row["ID"]).strip()
+
+request_counts = Counter()
+request_counts_lock = threading.Lock()
+
+# Rate-limit points left in the current fixed window
+bucket = {"remaining": rate_limit, "reset_at": time.time() + rate_window}
+
+app = Flask(__name__)
+
+
+def login_hash(login):
+    return zlib.crc32(login.encode("utf-8"))
+
+
+def user_id(login):
+    return known_ids.get(login) or str(100_000_000 + login_hash(login) % 900_000_000)
+
+
+def too_many():
+    return jsonify({
+        "error": "Bad Request", "status": 400,
+        "message": f"The number of logins exceeds the maximum of {MAX_LOGINS}"
+    }), 400
+
+
+@app.before_request
+def count_and_delay():
+    if not request.path.startswith("/helix/"):
+        return
+    with request_counts_lock:
+        request_counts[request.path] += 1
+        now = time.time()
+        if now >= bucket["reset_at"]:
+            bucket.update(remaining=rate_limit, reset_at=now + rate_window)
+        request.rate_limited = bucket["remaining"] <= 0
+        bucket["remaining"] = max(bucket["remaining"] - 1, 0)
+        request.rate_limit_headers = {
+            "Ratelimit-Limit": str(rate_limit),
+            "Ratelimit-Remaining": str(bucket["remaining"]),
+            "Ratelimit-Reset": str(math.ceil(bucket["reset_at"]))
+        }
+    if latency:
+        time.sleep(latency)
+    if request.rate_limited:
+        return jsonify({"error": "Too Many Requests", "status": 429, "message": "Rate limit exceeded"}), 429
+
+
+@app.after_request
+def add_rate_limit_headers(response):
+    response.headers.update(getattr(request, "rate_limit_headers", {}))
+    return response
+
+
+@app.route("/helix/streams")
+def streams():
+    logins = [login.lower() for login in request.args.getlist("user_login")]
+    if len(logins) > MAX_LOGINS:
+        return too_many()
+    # About a third of the streamers are live
+    data = [
+        {
+            "user_id": user_id(login),
+            "user_login": login,
+            "user_name": login,
+            "type": "live",
+            "viewer_count": login_hash(login) % 50_000,
+            "game_name": GAMES[login_hash(login) % len(GAMES)]
+        }
+        for login in dict.fromkeys(logins) if login_hash(login) % 3 == 0
+    ]
+    return jsonify({"data": data, "pagination": {}})
+
+
+@app.route("/helix/users")
+def users():
+    logins = [login.lower() for login in request.args.getlist("login")]
+    if len(logins) > MAX_LOGINS:
+        return too_many()
+    data = [{"id": user_id(login), "login": login, "display_name": login} for login in dict.fromkeys(logins)]
+    return jsonify({"data": data})
+
+
+@app.route("/helix/users/follows")
+def follows():
+    to_id = request.args.get("to_id", "")
+    return jsonify({"total": zlib.crc32(to_id.encode("utf-8")) % 5_000_000, "data": [], "pagination": {}})
+
+
+@app.route("/stats", methods=["GET", "DELETE"])
+def stats():
+    """Requests served per endpoint; DELETE resets the counters and the rate-limit bucket"""
+    with request_counts_lock:
+        if request.method == "DELETE":
+            request_counts.clear()
+            bucket.update(remaining=rate_limit, reset_at=time.time() + rate_window)
+        return jsonify(dict(request_counts))
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5003, threaded=True)
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+# Layout of a versioned models directory:
+#   models/<version>/...        one complete set of model artifacts
+#   models/<version>/manifest.json
+#   models/CURRENT              name of the version the server should load
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+def create_version_dir(models_root, copy_from=None):
+    """Create a new, unpublished models/<version>/ directory and return (version, path).
+
+    Versions are named after the creation time. With copy_from, the new
+    version starts as a copy of that directory's files (for incremental
+    updates, which rewrite some of them).
+    """
+    base = time.strftime("%Y%m%d-%H%M%S")
+    version = base
+    suffix = 1
+    while os.path.exists(os.path.join(models_root, version)):
+        suffix += 1
+        version = f"{base}-{suffix}"
+    path = os.path.join(models_root, version)
+    os.makedirs(path)
+    if copy_from is not None:
+        for name in os.listdir(copy_from):
+            source = os.path.join(copy_from, name)
+            if os.path.isfile(source) and name != MANIFEST_FILE:
+                shutil.copy2(source, os.path.join(path, name))
+    return version, path
+
+
+def write_manifest(directory, version, **info):
+    """Record the version, creation time and artifact sizes of a model directory"""
+    files = {
+        name: os.path.getsize(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory))
+        if os.path.isfile(os.path.join(directory, name)) and name != MANIFEST_FILE
+    }
+    manifest = {"version": version, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "files": files, **info}
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def read_manifest(directory):
+    """Return a model directory's manifest, or None for unversioned models"""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def publish_version(models_root, version):
+    """Atomically point CURRENT at a fully written version"""
+    tmp_path = os.path.join(models_root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(models_root, CURRENT_FILE))
+
+
+def current_version(models_root):
+    """Return the published version name, or None if nothing has been published"""
+    try:
+        with open(os.path.join(models_root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_model_dir(models_root, version=None):
+    """Return the directory of a version (default: the current one).
+
+    Models saved before versioning sit directly in the models root, which
+    is returned when no version has been published.
+    """
+    version = version or current_version(models_root)
+    return os.path.join(models_root, version) if version else models_root
+
+
+def list_versions(models_root):
+    """Return the names of all complete (manifest-bearing) versions, oldest first"""
+    if not os.path.isdir(models_root):
+        return []
+    return sorted(
+        name for name in os.listdir(models_root)
+        if os.path.isfile(os.path.join(models_root, name, MANIFEST_FILE))
+    )
+
+
+def prune_versions(models_root, keep=3):
+    """Delete all but the newest `keep` versions, never the current one.
+
+    Servers still mapping a deleted version's files keep reading them until
+    they swap models; the space is freed when the last mapping goes away.
+    """
+    current = current_version(models_root)
+    versions = list_versions(models_root)
+    for version in versions[:max(len(versions) - keep, 0)]:
+        if version != current:
+            shutil.rmtree(os.path.join(models_root, version), ignore_errors=True)
+
+
+class VersionWatcher:
+    """Background thread that polls CURRENT and calls on_change(version) when it moves.
+
+    `version` is the version already being served (default: whatever CURRENT
+    names now); a CURRENT that differs from it on the first poll counts as
+    a move, so a version published before the watcher started is not missed.
+    """
+
+    def __init__(self, models_root, interval, on_change, version=None):
+        self.models_root = models_root
+        self.interval = interval
+        self.on_change = on_change
+        self.version = version or current_version(models_root)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-version-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            version = current_version(self.models_root)
+            if version is None or version == self.version:
+                continue
+            self.version = version
+            try:
+                self.on_change(version)
+            except Exception as e:  # keep watching; the server keeps its current model
+                print(f"Model reload for version {version} failed: {e}")
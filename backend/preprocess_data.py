@@ -8,15 +8,31 @@ if torch.cuda.is_available():
 else:
     print("CUDA not available. Check your installation.")
 
+import argparse
 import json
 import os
 import pickle
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import normalize
+from scipy.sparse import csr_matrix
 from scipy.sparse.linalg import svds
 import time
+from dense_index import EMBEDDINGS_FILE, encode, load_encoder, save_embeddings
+from doc_store import append_doc_store, save_doc_store
+from model_registry import (
+    create_version_dir, prune_versions, publish_version, read_manifest, resolve_model_dir, write_manifest
+)
+from randomized_svd import randomized_svd
+from streamer_index import save_streamer_index
+from vector_index import (
+    IVF_CENTROIDS_FILE, IVF_DOC_IDS_FILE, IVF_OFFSETS_FILE, IVF_VECTORS_FILE, PQ_CODEBOOKS_FILE, PQ_CODES_FILE,
+    save_ivf_index, save_pq_index
+)
+from vocabulary import QueryVectorizer, save_vocabulary
 
 # Get the directory of the current script (backend folder)
 current_directory = os.path.dirname(os.path.abspath(__file__))
@@ -24,14 +40,26 @@ current_directory = os.path.dirname(os.path.abspath(__file__))
 # Specify the path to the JSON file (init.json) in the backend folder
 json_path = os.path.join(current_directory, "init.json")
 
+# Bookkeeping for incremental updates: document counts and the share of the
+# TF-IDF energy the concept space captured at the last full fit
+MODEL_STATE_FILE = "model_state.json"
+
 # Create a models directory if it doesn't exist
 models_dir = os.path.join(current_directory, "models")
 os.makedirs(models_dir, exist_ok=True)
 
 # TF-IDF SVD Search class (similar to the one in app.py but optimized for preprocessing)
 class TFIDFSVDSearch:
-    def __init__(self, n_components= 30):
+    def __init__(self, n_components= 30, svd_solver="arpack", power_iterations=4, oversamples=10,
+                 svd_threads=None, spill_dir=None):
         self.n_components = n_components
+        # "arpack" (scipy svds, or CuPy on a GPU) or "randomized" (multi-threaded CPU range finder)
+        self.svd_solver = svd_solver
+        self.power_iterations = power_iterations
+        self.oversamples = oversamples
+        self.svd_threads = svd_threads
+        # Directory for the memory-mapped TF-IDF matrix (None: build it in memory)
+        self.spill_dir = spill_dir
         self.vectorizer = TfidfVectorizer(
             stop_words="english",
             min_df=2,       # Include all terms, even rare ones
@@ -45,6 +73,7 @@ class TFIDFSVDSearch:
         self.vt = None       # Concept-term matrix
         self.docs_compressed = None  # Normalized document vectors in concept space
         self.dimension_labels = []   # Labels for each SVD dimension
+        self.captured_energy = None  # Share of the TF-IDF matrix's energy kept by the SVD
         
     def preprocess_documents(self, reddit_data, twitter_data, wiki_data, details_data):
         """Extract all documents from the various data sources and prepare for TF-IDF"""
@@ -93,18 +122,68 @@ class TFIDFSVDSearch:
         print(f"Preprocessed {len(self.documents)} documents for TF-IDF and SVD")
     
     def fit(self):
-        """Fit the TF-IDF model and perform SVD with GPU acceleration if available"""
+        """Fit the TF-IDF model and perform SVD (randomized, or ARPACK with GPU acceleration if available)"""
         print("Fitting TF-IDF vectorizer...")
         start_time = time.time()
-        td_matrix = self.vectorizer.fit_transform(self.documents)
-        print(f"TF-IDF vectorization completed in {time.time() - start_time:.2f} seconds")
+        spill_path = tempfile.mkdtemp(prefix="tfidf-", dir=self.spill_dir) if self.spill_dir else None
+        try:
+            if spill_path:
+                # Only the vocabulary and IDF weights are fitted in memory; the
+                # TF-IDF rows go to memory-mapped files one block at a time
+                self.vectorizer.fit(self.documents)
+                td_matrix = transform_to_disk(self.vectorizer, self.documents, spill_path)
+            else:
+                td_matrix = self.vectorizer.fit_transform(self.documents)
+            print(f"TF-IDF vectorization completed in {time.time() - start_time:.2f} seconds")
+            self._decompose(td_matrix)
+        finally:
+            if spill_path:
+                shutil.rmtree(spill_path, ignore_errors=True)
+        
+        # Store the vocabulary mapping
+        self.index_to_word = {i: t for t, i in self.vectorizer.vocabulary_.items()}
+        self.word_to_index = self.vectorizer.vocabulary_
+        
+        # Generate labels for each SVD dimension
+        self.dimension_labels = self._generate_dimension_labels()
         
+        print("Model training completed successfully")
+        return self
+    
+    def _decompose(self, td_matrix):
+        """Truncated SVD of the TF-IDF matrix into u, s, vt and the normalized document vectors"""
         print(f"TF-IDF matrix shape: {td_matrix.shape}")
         print(f"Vocabulary size: {len(self.vectorizer.vocabulary_)}")
         
-        print(f"Performing SVD with {self.n_components} components...")
+        print(f"Performing {self.svd_solver} SVD with {self.n_components} components...")
         start_time = time.time()
         
+        if self.svd_solver == "randomized":
+            self.u, self.s, self.vt = randomized_svd(
+                td_matrix, self.n_components, n_oversamples=self.oversamples,
+                n_iter=self.power_iterations, n_threads=self.svd_threads
+            )
+            print(f"Randomized SVD completed in {time.time() - start_time:.2f} seconds")
+        else:
+            self._arpack_svd(td_matrix, start_time)
+        
+        # Sort the SVD components by singular values
+        idx = np.argsort(-self.s)
+        self.s = self.s[idx]
+        self.u = self.u[:, idx]
+        self.vt = self.vt[idx, :]
+        
+        # Normalize document vectors for cosine similarity
+        self.docs_compressed = normalize(self.u)
+        
+        # TF-IDF rows are unit length, so the squared Frobenius norm is the
+        # number of non-empty documents; incremental updates compare against this
+        n_nonempty = np.count_nonzero(td_matrix.getnnz(axis=1))
+        self.captured_energy = float(np.sum(self.s ** 2) / max(n_nonempty, 1))
+        print(f"Explained variance: {self.captured_energy:.1%} of the TF-IDF matrix's energy")
+    
+    def _arpack_svd(self, td_matrix, start_time):
+        """Truncated SVD with scipy's svds, on the GPU through CuPy when CUDA is available"""
         try:
             import torch
             import cupy as cp
@@ -149,25 +228,6 @@ class TFIDFSVDSearch:
             from scipy.sparse.linalg import svds
             self.u, self.s, self.vt = svds(td_matrix, k=self.n_components)
             print(f"CPU SVD completed in {time.time() - start_time:.2f} seconds")
-        
-        # Sort the SVD components by singular values
-        idx = np.argsort(-self.s)
-        self.s = self.s[idx]
-        self.u = self.u[:, idx]
-        self.vt = self.vt[idx, :]
-        
-        # Normalize document vectors for cosine similarity
-        self.docs_compressed = normalize(self.u)
-        
-        # Store the vocabulary mapping
-        self.index_to_word = {i: t for t, i in self.vectorizer.vocabulary_.items()}
-        self.word_to_index = self.vectorizer.vocabulary_
-        
-        # Generate labels for each SVD dimension
-        self.dimension_labels = self._generate_dimension_labels()
-        
-        print("Model training completed successfully")
-        return self
     
     def _generate_dimension_labels(self, top_n=3):
         """Generate representative labels for each SVD dimension based on top words"""
@@ -196,40 +256,391 @@ class TFIDFSVDSearch:
             
         return dimension_labels
     
-    def save_model(self, directory):
-        """Save all model components to disk"""
-        # Save the vectorizer
-        with open(os.path.join(directory, "vectorizer.pkl"), "wb") as f:
-            pickle.dump(self.vectorizer, f)
+    def query_projection(self):
+        """Return the [n_terms, n_components] float32 matrix mapping TF-IDF to weighted concept space"""
+        # Row-major so each term's weights are contiguous; a query only touches
+        # the rows of its non-zero terms
+        return np.ascontiguousarray((self.vt.T * self.s).astype(np.float32))
+    
+    def save_model(self, directory, dtype=np.float32, ivf_lists=0, pq_subspaces=0, embed_model=None):
+        """Save all model components to disk
+        
+        The document and term matrices are written as `dtype` (float32 by
+        default, float16 to halve them again) so the server can memory-map
+        them directly. Optional extras, each off by default: an IVF
+        approximate nearest neighbour index with `ivf_lists` lists,
+        product-quantized codes with `pq_subspaces` subspaces, and dense
+        embeddings from the sentence-transformers model `embed_model`.
+        """
+        # Save the vocabulary and idf weights in the compact query-side format,
+        # checked against the fitted vectorizer on up to 1000 of the documents
+        sample = self.documents[::max(len(self.documents) // 1000, 1)]
+        save_vocabulary(self.vectorizer, directory, check_documents=sample)
         
         # Save SVD components
-        np.save(os.path.join(directory, "u_matrix.npy"), self.u)
+        np.save(os.path.join(directory, "u_matrix.npy"), self.u.astype(dtype))
         np.save(os.path.join(directory, "s_values.npy"), self.s)
-        np.save(os.path.join(directory, "vt_matrix.npy"), self.vt)
+        np.save(os.path.join(directory, "vt_matrix.npy"), self.vt.astype(dtype))
+        
+        # Save the query projection: vt.T with the singular values folded in,
+        # so serving maps a query to concept space with one sparse @ dense product
+        np.save(os.path.join(directory, "query_projection.npy"), self.query_projection())
         
         # Save normalized document vectors
-        np.save(os.path.join(directory, "docs_compressed.npy"), self.docs_compressed)
+        np.save(os.path.join(directory, "docs_compressed.npy"), self.docs_compressed.astype(dtype))
+        
+        # Save the columnar document store (snippets and display fields only)
+        doc_streamer_ids, n_streamers = save_doc_store(self.doc_lookup, directory)
+        
+        # Save per-streamer centroids for two-stage (streamer first) retrieval
+        save_streamer_index(self.docs_compressed, doc_streamer_ids, n_streamers, directory, dtype=dtype)
         
-        # Save document lookup mappings
-        with open(os.path.join(directory, "doc_lookup.pkl"), "wb") as f:
-            pickle.dump(self.doc_lookup, f)
+        # Optionally save the IVF index used for approximate candidate retrieval
+        if ivf_lists > 0:
+            print(f"Building IVF index with {ivf_lists} lists...")
+            save_ivf_index(self.docs_compressed, ivf_lists, directory, dtype=dtype)
+        else:
+            remove_files(directory, [IVF_CENTROIDS_FILE, IVF_OFFSETS_FILE, IVF_DOC_IDS_FILE, IVF_VECTORS_FILE])
         
-        # Save word mappings
-        with open(os.path.join(directory, "index_to_word.pkl"), "wb") as f:
-            pickle.dump(self.index_to_word, f)
+        # Optionally save product-quantized codes for compressed-domain scoring
+        if pq_subspaces > 0:
+            print(f"Training product quantizer with {pq_subspaces} subspaces...")
+            save_pq_index(self.docs_compressed, pq_subspaces, directory)
+        else:
+            remove_files(directory, [PQ_CODEBOOKS_FILE, PQ_CODES_FILE])
+        
+        # Optionally save dense document embeddings (float16, in document order)
+        if embed_model:
+            encoder = load_encoder(embed_model, offline=False)
+            if encoder is not None:
+                print(f"Encoding {len(self.documents)} documents with {embed_model}...")
+                save_embeddings(encoder, self.documents, directory)
         
         # Save dimension labels
         with open(os.path.join(directory, "dimension_labels.pkl"), "wb") as f:
             pickle.dump(self.dimension_labels, f)
         
+        # Save the state incremental updates measure drift and growth against
+        save_model_state(directory, {
+            "n_docs_fit": len(self.documents),
+            "n_docs": len(self.documents),
+            "captured_energy": self.captured_energy,
+        })
+        
         print(f"All model components saved to {directory}")
 
 
+def transform_to_disk(vectorizer, documents, directory, block_docs=50000):
+    """TF-IDF transform the documents into a CSR matrix over memory-mapped arrays.
+
+    Documents are transformed block_docs at a time and each block's values
+    and column indices are appended to raw files in `directory`, so the
+    whole matrix never sits in memory; the SVD then streams it from disk in
+    row blocks. Only the row pointers (one int per document) stay in RAM.
+    """
+    data_path = os.path.join(directory, "tfidf_data.bin")
+    indices_path = os.path.join(directory, "tfidf_indices.bin")
+    indptr = [np.zeros(1, dtype=np.int64)]
+    nnz = 0
+    with open(data_path, "wb") as data_file, open(indices_path, "wb") as indices_file:
+        for start in range(0, len(documents), block_docs):
+            block = vectorizer.transform(documents[start:start + block_docs])
+            block.data.astype(np.float64).tofile(data_file)
+            block.indices.astype(np.int32).tofile(indices_file)
+            indptr.append(block.indptr[1:].astype(np.int64) + nnz)
+            nnz += block.nnz
+    if nnz == 0:
+        return csr_matrix((len(documents), len(vectorizer.vocabulary_)))
+    
+    # scipy only keeps the memory-mapped arrays (instead of copying them) when
+    # indptr has the same dtype as the indices
+    index_dtype = np.int32 if nnz < 2 ** 31 else np.int64
+    data = np.memmap(data_path, dtype=np.float64, mode="r", shape=(nnz,))
+    indices = np.memmap(indices_path, dtype=np.int32, mode="r", shape=(nnz,))
+    return csr_matrix(
+        (data, indices, np.concatenate(indptr).astype(index_dtype)),
+        shape=(len(documents), len(vectorizer.vocabulary_)), copy=False
+    )
+
+
+def remove_files(directory, names):
+    """Delete optional artifacts left over from a previous build"""
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def save_model_state(directory, state):
+    with open(os.path.join(directory, MODEL_STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def load_model_state(directory):
+    """Return the saved model state, or None for models saved without one"""
+    path = os.path.join(directory, MODEL_STATE_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def split_new_data(combined_data, new_data):
+    """Merge a batch of new data (same layout as init.json) into the existing data.
+
+    Returns (merged data, additions, n_replaced). `additions` holds only what
+    can be appended as new documents: reddit posts and tweets, plus wiki
+    and details entries for streamers that had none. n_replaced counts
+    entries that change an existing wiki or details document, which an
+    append-only update cannot express.
+    """
+    merged = {key: combined_data[key].copy() for key in ("reddit", "twitter", "wiki", "details")}
+    additions = {"reddit": {}, "twitter": {}, "wiki": {} if isinstance(merged["wiki"], dict) else [], "details": {}}
+    n_replaced = 0
+    
+    for key in ("reddit", "twitter"):
+        for streamer, items in new_data.get(key, {}).items():
+            merged[key][streamer] = list(merged[key].get(streamer, [])) + list(items)
+            additions[key][streamer] = list(items)
+    
+    new_wiki = new_data.get("wiki", {})
+    if isinstance(merged["wiki"], list):
+        new_entries = list(new_wiki) if isinstance(new_wiki, list) else [
+            dict(entry, streamer=streamer) for streamer, entry in new_wiki.items() if isinstance(entry, dict)
+        ]
+        merged["wiki"].extend(new_entries)
+        additions["wiki"].extend(new_entries)
+    else:
+        for streamer, entry in (new_wiki.items() if isinstance(new_wiki, dict) else []):
+            if streamer in merged["wiki"]:
+                n_replaced += merged["wiki"][streamer] != entry
+            else:
+                additions["wiki"][streamer] = entry
+            merged["wiki"][streamer] = entry
+    
+    for streamer, details in new_data.get("details", {}).items():
+        if streamer in merged["details"]:
+            n_replaced += str(merged["details"][streamer].get("Description", "")) != str(details.get("Description", ""))
+        else:
+            additions["details"][streamer] = details
+        merged["details"][streamer] = details
+    
+    return merged, additions, n_replaced
+
+
+def fold_in(directory, additions, max_oov=0.3, max_drift=0.25, max_growth=0.2, embed_model=None):
+    """Append new documents to a saved model without refitting TF-IDF or the SVD.
+
+    New documents are vectorized with the saved vocabulary and idf weights
+    and folded into the existing concept space (u = x @ vt.T / s), then
+    appended to docs_compressed, u and the document store; the streamer
+    centroids are rebuilt and IVF / PQ codes (if present) are extended
+    with their existing centroids.
+    
+    Returns False without touching the model when a full refit is needed
+    instead: when more than max_oov of the new documents' word tokens
+    (unigrams) are out of vocabulary, when the concept space captures more than max_drift less
+    of their TF-IDF energy than it did for the training corpus, or when
+    documents added since the last fit would exceed max_growth of it.
+    """
+    state = load_model_state(directory)
+    if state is None:
+        print("No model state saved with this model, a full refit is needed")
+        return False
+    
+    batch = TFIDFSVDSearch()
+    batch.preprocess_documents(additions["reddit"], additions["twitter"], additions["wiki"], additions["details"])
+    if not batch.documents:
+        print("No new documents to add")
+        return True
+    
+    # Only unigrams count: with min_df=2 most bigrams miss the vocabulary even
+    # for the training documents themselves (about a third of their terms)
+    vectorizer = QueryVectorizer(directory)
+    n_terms = n_known = 0
+    for doc in batch.documents:
+        for token in vectorizer.tokenize(doc):
+            n_terms += 1
+            n_known += vectorizer.term_index(token) >= 0
+    oov_rate = 1 - n_known / n_terms if n_terms else 0.0
+    
+    # Project onto the concept axes; vt's rows are orthonormal, so the squared
+    # norm of the projection is the energy of each document the model keeps
+    s = np.load(os.path.join(directory, "s_values.npy"))
+    vt = np.load(os.path.join(directory, "vt_matrix.npy")).astype(np.float64)
+    td_matrix = vectorizer.transform(batch.documents)
+    projected = np.asarray(td_matrix @ vt.T)
+    n_nonempty = np.count_nonzero(td_matrix.getnnz(axis=1))
+    captured = float(np.sum(projected ** 2) / max(n_nonempty, 1))
+    drift = 1 - captured / state["captured_energy"] if state["captured_energy"] else 0.0
+    growth = (state["n_docs"] + len(batch.documents) - state["n_docs_fit"]) / max(state["n_docs_fit"], 1)
+    
+    print(f"New documents: {len(batch.documents)} (OOV words: {oov_rate:.1%}, "
+          f"drift: {drift:.1%}, growth since fit: {growth:.1%})")
+    reasons = [
+        f"{name} {value:.1%} > {limit:.1%}"
+        for name, value, limit in [("OOV", oov_rate, max_oov), ("drift", drift, max_drift), ("growth", growth, max_growth)]
+        if value > limit
+    ]
+    if reasons:
+        print(f"Full refit needed: {', '.join(reasons)}")
+        return False
+    
+    # Fold in: u = x @ V @ S^-1, normalized like the fitted documents
+    u_new = projected / s
+    docs_new = normalize(u_new)
+    
+    def append_rows(name, rows):
+        path = os.path.join(directory, name)
+        existing = np.load(path)
+        combined = np.concatenate([existing, rows.astype(existing.dtype)])
+        np.save(path, combined)
+        return combined
+    
+    append_rows("u_matrix.npy", u_new)
+    docs_compressed = append_rows("docs_compressed.npy", docs_new)
+    doc_streamer_ids, n_streamers = append_doc_store(batch.doc_lookup, directory)
+    save_streamer_index(docs_compressed, doc_streamer_ids, n_streamers, directory, dtype=docs_compressed.dtype)
+    
+    if os.path.isfile(os.path.join(directory, IVF_CENTROIDS_FILE)):
+        centroids = np.load(os.path.join(directory, IVF_CENTROIDS_FILE))
+        vectors_dtype = np.load(os.path.join(directory, IVF_VECTORS_FILE), mmap_mode="r").dtype
+        save_ivf_index(docs_compressed, len(centroids), directory, dtype=vectors_dtype, centroids=centroids)
+    if os.path.isfile(os.path.join(directory, PQ_CODEBOOKS_FILE)):
+        codebooks = np.load(os.path.join(directory, PQ_CODEBOOKS_FILE))
+        save_pq_index(docs_compressed, len(codebooks), directory, codebooks=codebooks)
+    
+    if os.path.isfile(os.path.join(directory, EMBEDDINGS_FILE)):
+        encoder = load_encoder(embed_model, offline=False) if embed_model else None
+        if encoder is not None:
+            append_rows(EMBEDDINGS_FILE, encode(encoder, batch.documents))
+        else:
+            print(f"{EMBEDDINGS_FILE} was not extended (pass --embed-model); hybrid search stays "
+                  "disabled until the documents are re-encoded")
+    
+    state["n_docs"] += len(batch.documents)
+    save_model_state(directory, state)
+    print(f"Folded {len(batch.documents)} documents into {directory} ({state['n_docs']} total)")
+    return True
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Precompute the TF-IDF + SVD search model")
+    parser.add_argument(
+        "--dtype", choices=["float32", "float16", "float64"],
+        help="Storage dtype for the document and term matrices (default: float32, or the saved "
+             "model's dtype when an incremental update refits)"
+    )
+    parser.add_argument(
+        "--components", type=int,
+        help="Number of SVD components (default: 30, or the saved model's count when an "
+             "incremental update refits)"
+    )
+    parser.add_argument(
+        "--svd", choices=["arpack", "randomized"],
+        help="SVD solver: scipy's ARPACK svds (GPU through CuPy when available) or a multi-threaded "
+             "randomized range finder, much faster for many components (default: arpack, or the "
+             "saved model's solver when an incremental update refits)"
+    )
+    parser.add_argument("--power-iterations", type=int, default=4,
+                        help="Power iterations of the randomized solver; more is slower but more "
+                             "accurate on slowly decaying spectra (default: 4)")
+    parser.add_argument("--oversamples", type=int, default=10,
+                        help="Extra random directions the randomized solver samples beyond --components (default: 10)")
+    parser.add_argument("--svd-threads", type=int,
+                        help="Threads for the randomized solver's matrix products (default: all cores)")
+    parser.add_argument("--spill-dir",
+                        help="Write the TF-IDF matrix to memory-mapped files in this directory block by "
+                             "block, so the SVD streams it from disk instead of holding it in memory "
+                             "(the vectorizer's term counting still runs in memory)")
+    parser.add_argument(
+        "--ivf-lists", type=int, default=0,
+        help="Build an IVF approximate nearest neighbour index with this many lists "
+             "(around sqrt(n_docs) is a good start; default: 0, no index)"
+    )
+    parser.add_argument(
+        "--pq-subspaces", type=int, default=0,
+        help="Also product-quantize the document vectors into this many one-byte codes "
+             "(an even divisor of the component count, e.g. 10; default: 0, no codes)"
+    )
+    parser.add_argument(
+        "--embed-model",
+        help="Also encode the documents with this sentence-transformers model for hybrid "
+             "dense retrieval (e.g. sentence-transformers/all-MiniLM-L6-v2)"
+    )
+    parser.add_argument(
+        "--incremental", metavar="NEW_JSON",
+        help="Add the documents in NEW_JSON (same layout as init.json) to the saved model, "
+             "refitting only when the thresholds below are crossed; NEW_JSON is merged into init.json"
+    )
+    parser.add_argument("--max-oov", type=float, default=0.3,
+                        help="Refit when more than this share of the new documents' words is out of vocabulary (default: 0.3)")
+    parser.add_argument("--max-drift", type=float, default=0.25,
+                        help="Refit when the concept space keeps this much less of the new "
+                             "documents' TF-IDF energy than of the training corpus (default: 0.25)")
+    parser.add_argument("--max-growth", type=float, default=0.2,
+                        help="Refit when documents added since the last fit exceed this share of it (default: 0.2)")
+    parser.add_argument("--keep-versions", type=int, default=3,
+                        help="Number of model versions to keep in the models directory (default: 3)")
+    args = parser.parse_args()
+    
     print("Loading data from init.json...")
     # Load the JSON data with UTF-8 encoding
     with open(json_path, "r", encoding="utf-8") as file:
         combined_data = json.load(file)
+    
+    if args.incremental:
+        with open(args.incremental, "r", encoding="utf-8") as file:
+            new_data = json.load(file)
+        combined_data, additions, n_replaced = split_new_data(combined_data, new_data)
+        
+        start_time = time.time()
+        current_dir = resolve_model_dir(models_dir)
+        if n_replaced:
+            print(f"{n_replaced} existing wiki/details documents changed, a full refit is needed")
+            folded = False
+        else:
+            # Update a copy; the running servers keep mapping the current version
+            version, version_dir = create_version_dir(models_dir, copy_from=current_dir)
+            folded = fold_in(version_dir, additions, max_oov=args.max_oov, max_drift=args.max_drift,
+                             max_growth=args.max_growth, embed_model=args.embed_model)
+            if folded:
+                # Folding in keeps the concept space, so the build settings carry over
+                inherited = {
+                    name: value for name, value in (read_manifest(current_dir) or {}).items()
+                    if name in ("dtype", "n_components", "svd")
+                }
+                write_manifest(version_dir, version, build="incremental", parent=os.path.basename(current_dir),
+                               n_docs=load_model_state(version_dir)["n_docs"], **inherited)
+            else:
+                shutil.rmtree(version_dir)
+        
+        # init.json stays the complete source for the next full rebuild
+        tmp_path = json_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(combined_data, file)
+        os.replace(tmp_path, json_path)
+        
+        if folded:
+            publish_version(models_dir, version)
+            prune_versions(models_dir, keep=args.keep_versions)
+            print(f"Incremental update completed in {time.time() - start_time:.2f} seconds (version {version})")
+            return
+        print("\nRefitting the full model...")
+        # Rebuild the optional indexes the saved model had, with the same sizes
+        if not args.ivf_lists and os.path.isfile(os.path.join(current_dir, IVF_CENTROIDS_FILE)):
+            args.ivf_lists = len(np.load(os.path.join(current_dir, IVF_CENTROIDS_FILE)))
+        if not args.pq_subspaces and os.path.isfile(os.path.join(current_dir, PQ_CODEBOOKS_FILE)):
+            args.pq_subspaces = len(np.load(os.path.join(current_dir, PQ_CODEBOOKS_FILE)))
+        if args.components is None and os.path.isfile(os.path.join(current_dir, "s_values.npy")):
+            args.components = len(np.load(os.path.join(current_dir, "s_values.npy")))
+        manifest = read_manifest(current_dir) or {}
+        if args.svd is None:
+            args.svd = manifest.get("svd")
+        if args.dtype is None:
+            args.dtype = manifest.get("dtype")
+        if args.dtype is None and os.path.isfile(os.path.join(current_dir, "docs_compressed.npy")):
+            args.dtype = np.load(os.path.join(current_dir, "docs_compressed.npy"), mmap_mode="r").dtype.name
 
     # Extract the individual datasets
     reddit_data = combined_data["reddit"]
@@ -248,7 +659,10 @@ def main():
     
     # Initialize and train the model
     print("\nInitializing TF-IDF SVD model...")
-    search_engine = TFIDFSVDSearch(n_components=30)
+    search_engine = TFIDFSVDSearch(
+        n_components=args.components or 30, svd_solver=args.svd or "arpack", power_iterations=args.power_iterations,
+        oversamples=args.oversamples, svd_threads=args.svd_threads, spill_dir=args.spill_dir
+    )
     
     # Preprocess documents
     search_engine.preprocess_documents(reddit_data, twitter_data, wiki_data, details_data)
@@ -259,12 +673,22 @@ def main():
     search_engine.fit()
     print(f"Total training time: {time.time() - start_time:.2f} seconds")
     
-    # Save the model
+    # Save the model into a new version directory, then publish it; servers
+    # watching models/CURRENT pick it up without a restart
     print("\nSaving model to disk...")
-    search_engine.save_model(models_dir)
+    version, version_dir = create_version_dir(models_dir)
+    args.dtype = args.dtype or "float32"
+    search_engine.save_model(version_dir, dtype=np.dtype(args.dtype), ivf_lists=args.ivf_lists,
+                             pq_subspaces=args.pq_subspaces,
+                             embed_model=args.embed_model)
+    write_manifest(version_dir, version, build="full", n_docs=len(search_engine.documents), dtype=args.dtype,
+                   n_components=search_engine.n_components, svd=search_engine.svd_solver,
+                   captured_energy=search_engine.captured_energy)
+    publish_version(models_dir, version)
+    prune_versions(models_dir, keep=args.keep_versions)
     
     print("\nPreprocessing completed successfully.")
-    print(f"Model saved to {models_dir}")
+    print(f"Model saved to {version_dir} (published as version {version})")
     print("You can now run the app.py server with optimized loading.")
 
 
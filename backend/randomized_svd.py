@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.linalg
+
+
+def row_blocks(n_rows, block_rows):
+    """Return the (start, end) row ranges of consecutive blocks of block_rows rows"""
+    return [(start, min(start + block_rows, n_rows)) for start in range(0, n_rows, block_rows)]
+
+
+def _orthonormalize(matrix):
+    q, _ = scipy.linalg.qr(matrix, mode="economic", check_finite=False)
+    return q
+
+
+def _renormalize(matrix):
+    """A well-conditioned basis of matrix's column span (permuted LU, several times cheaper than QR)"""
+    lower, _ = scipy.linalg.lu(matrix, permute_l=True, check_finite=False)
+    return lower
+
+
+def _multiply(matrix, blocks, right, executor):
+    """matrix @ right, one row block per task"""
+    out = np.empty((matrix.shape[0], right.shape[1]), dtype=right.dtype)
+
+    def run(start, end):
+        out[start:end] = matrix[start:end] @ right
+
+    for future in [executor.submit(run, start, end) for start, end in blocks]:
+        future.result()
+    return out
+
+
+def _multiply_transposed(matrix, blocks, left, executor):
+    """matrix.T @ left, summing the contribution of one row block per task"""
+    total = np.zeros((matrix.shape[1], left.shape[1]), dtype=left.dtype)
+    futures = [
+        executor.submit(lambda start, end: matrix[start:end].T @ left[start:end], start, end)
+        for start, end in blocks
+    ]
+    # Summed in block order, so the result does not depend on thread timing
+    for future in futures:
+        total += future.result()
+    return total
+
+
+def randomized_svd(matrix, k, n_oversamples=10, n_iter=4, block_rows=65536, n_threads=None, seed=0):
+    """Truncated SVD by randomized range finding (Halko, Martinsson & Tropp).
+
+    A random sketch of matrix's range is sharpened with n_iter power
+    iterations (renormalized with an LU factorization every half step so
+    small singular values survive; only the final basis needs a QR), then
+    the SVD of the small projected matrix is lifted back.
+    `matrix` is only touched through products with row blocks of
+    block_rows rows, which run concurrently on n_threads threads (default:
+    all cores), so a CSR matrix backed by memory-mapped arrays is streamed
+    from disk instead of being loaded whole. Returns (u, s, vt) with the k
+    largest singular values in decreasing order.
+    """
+    n_rows, n_cols = matrix.shape
+    rank = min(k + n_oversamples, n_rows, n_cols)
+    blocks = row_blocks(n_rows, block_rows)
+    rng = np.random.default_rng(seed)
+
+    with ThreadPoolExecutor(max_workers=n_threads or os.cpu_count()) as executor:
+        q = _multiply(matrix, blocks, rng.standard_normal((n_cols, rank)), executor)
+        for _ in range(n_iter):
+            z = _renormalize(_multiply_transposed(matrix, blocks, _renormalize(q), executor))
+            q = _multiply(matrix, blocks, z, executor)
+        q = _orthonormalize(q)
+
+        # B = Q^T A is small ([rank, n_cols]), so it gets an exact SVD
+        b = _multiply_transposed(matrix, blocks, q, executor).T
+
+    u_b, s, vt = np.linalg.svd(b, full_matrices=False)
+    return q @ u_b[:, :k], s[:k], vt[:k]
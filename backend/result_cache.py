@@ -0,0 +1,350 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+def normalize_query(query):
+    """Normalize a query for cache lookups.
+
+    The vectorizer lowercases and tokenizes on word boundaries, so case and
+    runs of whitespace never change the results.
+    """
+    return " ".join(query.lower().split())
+
+
+def model_version(models_dir):
+    """Hash the names, sizes and mtimes of the model artifacts.
+
+    Any rebuild of the model changes the hash, which is what cached results
+    are keyed on.
+    """
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(models_dir)):
+        path = os.path.join(models_dir, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class ResultCache:
+    """In-process LRU cache for serialized search responses.
+
+    Bounded by entry count and total bytes, with an optional TTL in
+    seconds. Entries belong to one model version; a lookup or store under a
+    different version drops everything cached for the old one.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, version, key):
+        """Return the cached bytes for key, or None on a miss"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, version, key, value):
+        """Store serialized bytes under key, evicting least recently used entries"""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = (expires_at, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "model_version": self.version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self._bytes = 0
+            self.version = version
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class SQLiteResultCache:
+    """Result cache shared by every worker on a host, stored in a local SQLite file.
+
+    Same interface as ResultCache. In WAL mode lookups are plain reads that
+    never wait for a writer; stores run as short write transactions, and
+    LRU eviction by total bytes and entry count happens inside them, so the
+    limits hold across workers. Hit/miss counters and last-access times are
+    buffered per process and written with the next store, or at most every
+    FLUSH_INTERVAL seconds when the write lock happens to be free, so
+    stats() reports the host-wide hit rate without hits taking the lock.
+
+    The cache fails open: any SQLite error (lock timeout, full disk, corrupt
+    file) makes a lookup a miss and a store a no-op, counted in "errors",
+    and stats() then reports only the limits and this process's errors.
+    The constructor does raise sqlite3.Error when the file cannot be set up
+    at all, so the caller can pick another cache.
+    """
+
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_pid = None
+        self._take_pending()
+        self.errors = 0
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, version TEXT, value BLOB, size INTEGER,"
+                " last_access REAL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.executemany(
+                "INSERT OR IGNORE INTO counters VALUES (?, 0)",
+                [("hits",), ("misses",), ("evictions",), ("expirations",)]
+            )
+
+    def _connect(self):
+        # One connection per thread and per process (gunicorn forks after import)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, wait=True):
+        return _Transaction(self._connect(), wait)
+
+    def get(self, version, key):
+        """Return the cached bytes for key, or None on a miss"""
+        now = time.time()
+        try:
+            # Autocommit: a single read transaction, no write lock
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM entries WHERE key = ? AND version = ?", (key, version)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("lookup", e)
+            return None
+
+        with self._pending_lock:
+            self._check_pending_pid()
+            if row is None:
+                self._counts["misses"] += 1
+            elif row[1] is not None and row[1] <= now:
+                # Expired rows are deleted by the next store
+                self._counts["expirations"] += 1
+                self._counts["misses"] += 1
+                row = None
+            else:
+                self._counts["hits"] += 1
+                self._touched[key] = now
+            flush = time.monotonic() - self._flushed_at >= self.FLUSH_INTERVAL
+        if flush:
+            self._flush(wait=False)
+        return bytes(row[0]) if row is not None else None
+
+    def set(self, version, key, value):
+        """Store serialized bytes under key, evicting least recently used entries"""
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        try:
+            with self._transaction() as conn:
+                self._write_pending(conn)
+                # Entries from other model versions are never served again
+                conn.execute("DELETE FROM entries WHERE version != ? OR expires_at <= ?", (version, now))
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, version, sqlite3.Binary(value), len(value), now, expires_at)
+                )
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+                if count <= self.max_entries and total <= self.max_bytes:
+                    return
+
+                evicted = []
+                for old_key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    evicted.append((old_key,))
+                    count -= 1
+                    total -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+                self._bump(conn, "evictions", len(evicted))
+        except sqlite3.Error as e:
+            self._failed("store", e)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        self._flush(wait=True)
+        limits = {"backend": "sqlite", "path": self.path}
+        try:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            versions = [row[0] for row in conn.execute("SELECT DISTINCT version FROM entries")]
+        except sqlite3.Error as e:
+            self._failed("stats", e)
+            return {
+                **limits,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "errors": self.errors,
+            }
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **limits,
+            "model_version": versions[0] if len(versions) == 1 else None,
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "evictions": counters["evictions"],
+            "expirations": counters["expirations"],
+            "errors": self.errors,
+        }
+
+    def _check_pending_pid(self):
+        # Counts buffered before a fork belong to the parent process
+        if self._pending_pid != os.getpid():
+            self._counts = Counter()
+            self._touched = {}
+            self._flushed_at = time.monotonic()
+            self._pending_pid = os.getpid()
+
+    def _take_pending(self):
+        """Return and reset this process's buffered (counts, touched keys)"""
+        with self._pending_lock:
+            self._check_pending_pid()
+            pending = self._counts, self._touched
+            self._counts = Counter()
+            self._touched = {}
+            self._flushed_at = time.monotonic()
+            return pending
+
+    def _write_pending(self, conn):
+        """Write the buffered counters and access times inside conn's transaction (best effort)"""
+        counts, touched = self._take_pending()
+        conn.executemany(
+            "UPDATE counters SET value = value + ? WHERE name = ?",
+            [(amount, name) for name, amount in counts.items()]
+        )
+        conn.executemany(
+            "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in touched.items()]
+        )
+
+    def _flush(self, wait):
+        """Write buffered counters; with wait=False give up at once if another worker holds the write lock"""
+        try:
+            with self._transaction(wait) as conn:
+                self._write_pending(conn)
+        except sqlite3.OperationalError as e:
+            if wait:
+                self._failed("flush", e)
+        except sqlite3.Error as e:
+            self._failed("flush", e)
+
+    def _failed(self, operation, error):
+        self.errors += 1
+        print(f"Result cache {operation} failed, continuing without it: {error}")
+
+    @staticmethod
+    def _bump(conn, name, amount=1):
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+
+class _Transaction:
+    """Run a block as one IMMEDIATE transaction so concurrent writers serialize.
+
+    With wait=False, BEGIN fails immediately instead of waiting out the
+    busy timeout when another connection holds the write lock.
+    """
+
+    def __init__(self, conn, wait=True):
+        self.conn = conn
+        self.wait = wait
+
+    def __enter__(self):
+        if self.wait:
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+        self.conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        finally:
+            self.conn.execute("PRAGMA busy_timeout = 5000")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+
+# On-disk layout of a saved streamer index (all inside the models directory)
+CENTROIDS_FILE = "streamer_centroids.npy"            # [n_streamers, n_components] unit vectors
+DOC_OFFSETS_FILE = "streamer_doc_offsets.npy"        # int64 [n_streamers + 1]
+DOC_INDICES_FILE = "streamer_doc_indices.npy"        # int32 [n_docs] doc indices grouped by streamer
+
+
+def build_streamer_index(docs_compressed, doc_streamer_ids, n_streamers):
+    """Return (centroids, doc_offsets, doc_indices) for the documents' streamers.
+
+    Each centroid is the normalized mean of a streamer's document vectors in
+    the SVD concept space. doc_indices lists every streamer's documents
+    contiguously (in document order), delimited by doc_offsets.
+    """
+    doc_streamer_ids = np.asarray(doc_streamer_ids)
+    counts = np.bincount(doc_streamer_ids, minlength=n_streamers)
+
+    sums = np.zeros((n_streamers, docs_compressed.shape[1]))
+    np.add.at(sums, doc_streamer_ids, docs_compressed)
+    centroids = sums / np.maximum(counts, 1)[:, None]
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    centroids /= norms
+
+    doc_offsets = np.zeros(n_streamers + 1, dtype=np.int64)
+    doc_offsets[1:] = np.cumsum(counts)
+    doc_indices = np.argsort(doc_streamer_ids, kind="stable").astype(np.int32)
+    return centroids, doc_offsets, doc_indices
+
+
+def save_streamer_index(docs_compressed, doc_streamer_ids, n_streamers, directory, dtype=np.float32):
+    centroids, doc_offsets, doc_indices = build_streamer_index(docs_compressed, doc_streamer_ids, n_streamers)
+    np.save(os.path.join(directory, CENTROIDS_FILE), centroids.astype(dtype))
+    np.save(os.path.join(directory, DOC_OFFSETS_FILE), doc_offsets)
+    np.save(os.path.join(directory, DOC_INDICES_FILE), doc_indices)
+
+
+class StreamerIndex:
+    """Per-streamer centroids plus each streamer's document list, memory-mapped"""
+
+    def __init__(self, directory):
+        self.centroids = np.load(os.path.join(directory, CENTROIDS_FILE), mmap_mode="r")
+        self.doc_offsets = np.load(os.path.join(directory, DOC_OFFSETS_FILE), mmap_mode="r")
+        self.doc_indices = np.load(os.path.join(directory, DOC_INDICES_FILE), mmap_mode="r")
+
+    @staticmethod
+    def exists(directory):
+        return os.path.isfile(os.path.join(directory, CENTROIDS_FILE))
+
+    def documents_of(self, streamer_ids):
+        """Return the sorted document indices belonging to any of the streamers"""
+        if len(streamer_ids) == 0:
+            return np.empty(0, dtype=np.intp)
+        doc_indices = np.concatenate([
+            self.doc_indices[self.doc_offsets[s]:self.doc_offsets[s + 1]] for s in streamer_ids
+        ]).astype(np.intp)
+        # Sorted indices keep the gather from docs_compressed sequential
+        doc_indices.sort()
+        return doc_indices
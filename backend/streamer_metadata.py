@@ -0,0 +1,73 @@
+import json
+
+
+def _json_default(value):
+    # pandas can hand back numpy scalars for CSV cells
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """Serialize like the Flask JSON provider does in production (sorted, compact)"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+class StreamerMetadata:
+    """Per-streamer display metadata, resolved once at startup.
+
+    Indexed by the streamer ids of the document store. Each entry holds the
+    matched streamer_details.csv row (with its Twitch URL filled in), the
+    image path, and the pre-serialized JSON around a result card's
+    "documents" list, so a search response is assembled by joining on
+    streamer ids instead of re-resolving and re-serializing CSV rows.
+    """
+
+    def __init__(self, streamer_names, csv_rows):
+        self.csv_rows = csv_rows  # uppercase Name -> CSV row dict
+        self.ids = {}
+        self.names = []
+        self._card_prefixes = []
+        self._card_suffixes = []
+        for name in streamer_names:
+            self.add_streamer(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_streamer(self, name):
+        """Resolve and store metadata for a streamer, returning its id"""
+        if name in self.ids:
+            return self.ids[name]
+        row = self._find_csv_row(name)
+        if row is not None:
+            row = dict(row)
+            if not str(row.get("Twitch URL", "")).strip():
+                row["url"] = f"https://www.twitch.tv/{name}"
+
+        streamer_id = len(self.names)
+        self.ids[name] = streamer_id
+        self.names.append(name)
+        # Keys in sorted order so cards match the rest of the JSON output
+        self._card_prefixes.append('{"csv_data":' + dumps(row) + ',"documents":')
+        self._card_suffixes.append(
+            ',"image_path":' + dumps(f"images/streamer_images/{name.upper()}.jpg")
+            + ',"name":' + dumps(name)
+            + ',"twitch_info":' + dumps(row) + "}"
+        )
+        return streamer_id
+
+    def _find_csv_row(self, name):
+        variants = [name, name.upper(), name.lower(), name.title(), name.replace(" ", "")]
+        for variant in variants:
+            if variant in self.csv_rows:
+                return self.csv_rows[variant]
+        return None
+
+    def card_json(self, streamer_id, documents):
+        """Return the JSON result card for a streamer and its matching documents"""
+        return self._card_prefixes[streamer_id] + dumps(documents) + self._card_suffixes[streamer_id]
+
+    def cards_json(self, streamer_documents):
+        """Return a JSON array of cards for (streamer_id, documents) pairs"""
+        return "[" + ",".join(self.card_json(streamer_id, documents) for streamer_id, documents in streamer_documents) + "]"
@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def save_string_table(bytes_path, offsets_path, strings):
+    """Save strings as one UTF-8 byte blob plus an int64 [n + 1] offsets array"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(s) for s in encoded])
+    np.save(bytes_path, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(offsets_path, offsets)
+
+
+def append_string_table(bytes_path, offsets_path, strings):
+    """Append strings to a table saved by save_string_table, rewriting both files"""
+    blob = np.load(bytes_path)
+    offsets = np.load(offsets_path)
+    encoded = [s.encode("utf-8") for s in strings]
+    new_offsets = offsets[-1] + np.cumsum([len(s) for s in encoded], dtype=np.int64)
+    np.save(bytes_path, np.concatenate([blob, np.frombuffer(b"".join(encoded), dtype=np.uint8)]))
+    np.save(offsets_path, np.concatenate([offsets, new_offsets]))
+
+
+class StringTable:
+    """Read-only, memory-mapped sequence of byte strings saved by save_string_table.
+
+    Items are returned as bytes; only the requested slices of the blob are
+    ever read, so tables far larger than what is needed per request stay
+    on disk (or in the shared page cache).
+    """
+
+    def __init__(self, bytes_path, offsets_path):
+        self.blob = np.load(bytes_path, mmap_mode="r")
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+    def get_str(self, index):
+        return self[index].decode("utf-8")
@@ -0,0 +1,201 @@
+import numpy as np
+
+
+def top_k_indices(scores, k):
+    """Return the indices of the k highest scores, best first.
+
+    Uses argpartition so only the k winners get sorted instead of the whole
+    array. Ties are broken by the lower index so results are deterministic.
+    """
+    scores = np.asarray(scores).ravel()
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.lexsort((np.arange(n), -scores))
+
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    kth_score = scores[candidates].min()
+
+    # argpartition picks an arbitrary subset of any ties at the cut-off,
+    # so swap in the lowest-index ties when there are more than fit
+    n_ties = np.count_nonzero(scores == kth_score)
+    if n_ties > np.count_nonzero(scores[candidates] == kth_score):
+        above = np.flatnonzero(scores > kth_score)
+        ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def streaming_top_k(chunks, k):
+    """Merge per-chunk top-k results into a global top-k.
+
+    `chunks` yields (offset, scores) pairs where offset is the global index
+    of scores[0]. Only k candidates are kept between chunks, so corpora that
+    are too big to score at once can be processed block by block.
+    Returns (indices, scores), best first.
+    """
+    best = np.empty(0, dtype=np.intp), np.empty(0)
+    for offset, scores in chunks:
+        best = _merge_top_k(best, offset, scores, k)
+    return best
+
+
+def _merge_top_k(best, offset, scores, k):
+    """Merge the top k of one chunk of scores into the running (indices, scores)"""
+    best_indices, best_scores = best
+    scores = np.asarray(scores).ravel()
+    local = top_k_indices(scores, k)
+    merged_indices = np.concatenate([best_indices, local + offset])
+    merged_scores = np.concatenate([best_scores, scores[local]])
+    # Earlier chunks come first in the merged arrays, so position ties
+    # already resolve to the lower global index
+    keep = top_k_indices(merged_scores, k)
+    return merged_indices[keep], merged_scores[keep]
+
+
+def scoring_dtype(storage_dtype):
+    """Dtype to compute scores in for a matrix stored as storage_dtype"""
+    return np.float64 if storage_dtype == np.float64 else np.float32
+
+
+def score_top_k(matrix, vector, k, chunk_size=None):
+    """Score every row of `matrix` against `vector` and return the top k.
+
+    With chunk_size set, rows are scored in blocks of that many and merged
+    with streaming_top_k, which keeps peak memory flat for large (or
+    memory-mapped / float16) matrices. Returns (indices, scores), best first.
+    """
+    # Score in the matrix's own precision so float32 matrices are never
+    # upcast wholesale; float16 storage is widened a block at a time
+    compute_dtype = scoring_dtype(matrix.dtype)
+    vector = np.asarray(vector, dtype=compute_dtype).ravel()
+    if chunk_size is None or matrix.shape[0] <= chunk_size:
+        scores = matrix.astype(compute_dtype, copy=False) @ vector
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+
+    def chunks():
+        for start in range(0, matrix.shape[0], chunk_size):
+            block = matrix[start:start + chunk_size].astype(compute_dtype, copy=False)
+            yield start, block @ vector
+
+    return streaming_top_k(chunks(), k)
+
+
+def batch_score_top_k(matrix, vectors, k, chunk_size=65536):
+    """score_top_k for several queries at once (the rows of `vectors`).
+
+    Each block of chunk_size rows is scored against every query with one
+    matrix-matrix product and only each query's k best are kept between
+    blocks, so the score buffer is [n_queries, chunk_size] however large the
+    corpus is. Returns one (indices, scores) pair per query, best first.
+    """
+    compute_dtype = scoring_dtype(matrix.dtype)
+    vectors = np.asarray(vectors, dtype=compute_dtype)
+    best = [(np.empty(0, dtype=np.intp), np.empty(0, dtype=compute_dtype))] * len(vectors)
+    for start in range(0, matrix.shape[0], chunk_size):
+        block_scores = vectors @ matrix[start:start + chunk_size].astype(compute_dtype, copy=False).T
+        best = [_merge_top_k(query_best, start, scores, k) for query_best, scores in zip(best, block_scores)]
+    return best
+
+
+# Shard boundaries fall on multiples of this many rows. BLAS kernels score a
+# matrix's last few rows with a separate tail loop, so only aligned shards
+# reproduce the single-call scores bit for bit
+SHARD_ALIGNMENT = 1024
+
+
+def shard_bounds(n_rows, n_shards, alignment=SHARD_ALIGNMENT):
+    """Split n_rows into at most n_shards contiguous ranges starting on multiples of alignment.
+
+    Returns the boundaries [0, ..., n_rows].
+    """
+    n_blocks = -(-n_rows // alignment)
+    n_shards = max(1, min(n_shards, n_blocks))
+    starts = [(n_blocks * shard // n_shards) * alignment for shard in range(n_shards)]
+    return starts + [n_rows]
+
+
+def sharded_score_top_k(matrix, vector, k, executor, n_shards, chunk_size=None):
+    """score_top_k with the rows split into shards scored concurrently on `executor`.
+
+    NumPy releases the GIL inside the matrix products, so shards run on
+    separate cores. Each shard keeps its own top k and the shard results are
+    merged in row order; with aligned shard boundaries the indices and scores
+    are identical to score_top_k(matrix, vector, k, chunk_size).
+    """
+    bounds = shard_bounds(matrix.shape[0], n_shards, chunk_size or SHARD_ALIGNMENT)
+    if len(bounds) <= 2:
+        return score_top_k(matrix, vector, k, chunk_size=chunk_size)
+
+    futures = [
+        (start, executor.submit(score_top_k, matrix[start:end], vector, k, chunk_size))
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+    shard_indices = []
+    shard_scores = []
+    for start, future in futures:
+        indices, scores = future.result()
+        shard_indices.append(indices + start)
+        shard_scores.append(scores)
+
+    # Shards are concatenated in row order and each is sorted best-first with
+    # ties by index, so position ties resolve to the lower global index
+    merged_indices = np.concatenate(shard_indices)
+    merged_scores = np.concatenate(shard_scores)
+    keep = top_k_indices(merged_scores, k)
+    return merged_indices[keep], merged_scores[keep]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several best-first rankings of indices with reciprocal rank fusion.
+
+    Each index scores sum(1 / (k + rank)) over the rankings it appears in
+    (rank starting at 1), so it only depends on positions, not on how the
+    rankers' scores are scaled. Returns (indices, fused scores), best first.
+    """
+    rankings = [np.asarray(ranking, dtype=np.intp) for ranking in rankings]
+    indices = np.concatenate(rankings)
+    if len(indices) == 0:
+        return indices, np.empty(0)
+    contributions = np.concatenate([1.0 / (k + np.arange(1, len(ranking) + 1)) for ranking in rankings])
+    unique, inverse = np.unique(indices, return_inverse=True)
+    fused = np.bincount(inverse, weights=contributions)
+    order = top_k_indices(fused, len(fused))
+    return unique[order], fused[order]
+
+
+def top_groups(group_ids, scores, k, per_group):
+    """Rank groups by the sum of their `per_group` best scores.
+
+    `group_ids` and `scores` describe candidates sorted best-first (as
+    returned by score_top_k). Everything is done with array segment
+    reductions, so thousands of candidates cost about as much as fifty.
+    Ties between groups go to the group whose best candidate ranks higher.
+    Returns (group ids best-first, list of candidate position arrays for
+    each returned group, best-first within the group).
+    """
+    group_ids = np.asarray(group_ids)
+    n = group_ids.shape[0]
+    if n == 0 or k <= 0:
+        return group_ids[:0], []
+
+    # Stable sort groups candidates together while keeping their rank order
+    order = np.argsort(group_ids, kind="stable")
+    sorted_groups = group_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+
+    # Sum the first per_group scores of every segment
+    segment = np.repeat(np.arange(len(starts)), sizes)
+    rank_in_group = np.arange(n) - starts[segment]
+    keep = rank_in_group < per_group
+    totals = np.bincount(segment[keep], weights=np.asarray(scores)[order][keep], minlength=len(starts))
+
+    best_position = order[starts]
+    ranking = np.lexsort((best_position, -totals))[:k]
+    positions = [order[starts[g]:starts[g] + min(sizes[g], per_group)] for g in ranking]
+    return sorted_groups[starts[ranking]], positions
@@ -0,0 +1,239 @@
+import os
+
+import numpy as np
+
+from topk import scoring_dtype, top_k_indices
+
+# On-disk layout of a saved IVF index (all inside the models directory)
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"   # [n_lists, n_components] unit vectors
+IVF_OFFSETS_FILE = "ivf_offsets.npy"       # int64 [n_lists + 1] list boundaries
+IVF_DOC_IDS_FILE = "ivf_doc_ids.npy"       # int32 [n_docs] doc indices grouped by list
+IVF_VECTORS_FILE = "ivf_vectors.npy"       # [n_docs, n_components] vectors in list order
+
+
+def assign_clusters(vectors, centroids, chunk_size=65536):
+    """Return the index of the most similar centroid for every row"""
+    assignments = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], chunk_size):
+        block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors, n_clusters, n_iter=20, sample_size=100_000, seed=0):
+    """Cluster unit vectors by cosine similarity (Lloyd iterations on a sample).
+
+    Returns float32 [n_clusters, n_dims] unit centroids.
+    """
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(sample_size, n), replace=False))], dtype=np.float32)
+    n_clusters = min(n_clusters, sample.shape[0])
+    centroids = sample[rng.choice(sample.shape[0], size=n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign_clusters(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Re-seed empty clusters with random sample points
+        empty = norms[:, 0] == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()), replace=False)]
+            norms[empty] = np.linalg.norm(sums[empty], axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+def save_ivf_index(docs_compressed, n_lists, directory, dtype=np.float32, n_iter=20, seed=0, centroids=None):
+    """Build an inverted-file index over the document vectors and save it.
+
+    Pass the centroids of an existing index to only re-assign documents
+    (e.g. after appending some) instead of re-running k-means.
+    """
+    if centroids is None:
+        centroids = spherical_kmeans(docs_compressed, n_lists, n_iter=n_iter, seed=seed)
+    assignments = assign_clusters(docs_compressed, centroids)
+    doc_ids = np.argsort(assignments, kind="stable").astype(np.int32)
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assignments, minlength=len(centroids)))
+
+    np.save(os.path.join(directory, IVF_CENTROIDS_FILE), centroids)
+    np.save(os.path.join(directory, IVF_OFFSETS_FILE), offsets)
+    np.save(os.path.join(directory, IVF_DOC_IDS_FILE), doc_ids)
+    # Vectors are stored in list order so probing a list is one contiguous scan
+    np.save(os.path.join(directory, IVF_VECTORS_FILE), np.asarray(docs_compressed)[doc_ids].astype(dtype))
+
+
+class IVFIndex:
+    """Approximate nearest neighbour search over docs_compressed (CPU, NumPy only).
+
+    Documents are partitioned by their nearest k-means centroid. A query
+    scores the centroids, then only the documents of the `nprobe` best
+    lists. Larger nprobe means higher recall and higher latency; nprobe
+    equal to the number of lists is exact search.
+    """
+
+    def __init__(self, directory):
+        self.centroids = np.load(os.path.join(directory, IVF_CENTROIDS_FILE))
+        self.offsets = np.load(os.path.join(directory, IVF_OFFSETS_FILE), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(directory, IVF_DOC_IDS_FILE), mmap_mode="r")
+        self.vectors = np.load(os.path.join(directory, IVF_VECTORS_FILE), mmap_mode="r")
+
+    @staticmethod
+    def exists(directory):
+        return os.path.isfile(os.path.join(directory, IVF_CENTROIDS_FILE))
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def search(self, query_vec, k, nprobe=8):
+        """Return (doc indices, scores) of the approximate top k, best first"""
+        compute_dtype = scoring_dtype(self.vectors.dtype)
+        query_vec = np.asarray(query_vec, dtype=compute_dtype)
+        nprobe = min(max(int(nprobe), 1), self.n_lists)
+        probed = top_k_indices(self.centroids @ query_vec.astype(np.float32), nprobe)
+
+        # Probed lists are contiguous row ranges; gather them and score in one product
+        ranges = [(self.offsets[i], self.offsets[i + 1]) for i in np.sort(probed)]
+        candidate_ids = np.concatenate([self.doc_ids[start:end] for start, end in ranges]).astype(np.intp)
+        if len(candidate_ids) == 0:
+            return candidate_ids, np.empty(0, dtype=compute_dtype)
+        candidate_vectors = np.concatenate([self.vectors[start:end] for start, end in ranges])
+        candidate_scores = candidate_vectors.astype(compute_dtype, copy=False) @ query_vec
+
+        best = top_k_indices(candidate_scores, k)
+        ids, scores = candidate_ids[best], candidate_scores[best]
+        # Equal scores rank by document index, as in exact search
+        order = np.lexsort((ids, -scores))
+        return ids[order], scores[order]
+
+
+# On-disk layout of a saved product-quantization index
+PQ_CODEBOOKS_FILE = "pq_codebooks.npy"   # float32 [n_subspaces, 256, sub_dims] sub-vector centroids
+PQ_CODES_FILE = "pq_codes.npy"           # uint16 [n_subspaces / 2, n_docs] paired centroid ids
+
+PQ_CENTROIDS = 256  # one byte of code per sub-vector
+
+
+def kmeans(vectors, n_clusters, n_iter=20, seed=0):
+    """Euclidean k-means (Lloyd iterations); returns float32 [n_clusters, n_dims] centroids"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_clusters = min(n_clusters, vectors.shape[0])
+    centroids = vectors[rng.choice(vectors.shape[0], size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = nearest_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.stack([
+            np.bincount(assignments, weights=vectors[:, d], minlength=n_clusters) for d in range(vectors.shape[1])
+        ], axis=1)
+        # Empty clusters keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def nearest_centroids(vectors, centroids, chunk_size=65536):
+    """Return the index of the closest (Euclidean) centroid for every row"""
+    # argmin |x - c|^2 == argmax x.c - |c|^2 / 2
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(vectors.shape[0], dtype=np.intp)
+    for start in range(0, vectors.shape[0], chunk_size):
+        block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + chunk_size] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return assignments
+
+
+def save_pq_index(docs_compressed, n_subspaces, directory, n_iter=20, sample_size=100_000, seed=0, codebooks=None):
+    """Train a product quantizer on the document vectors and save codebooks plus codes.
+
+    Each vector is split into n_subspaces equal sub-vectors, and each
+    sub-vector is replaced by the id of its nearest of 256 centroids, so a
+    30-dim float32 document (120 bytes) is stored in n_subspaces bytes.
+    Codes of neighbouring subspaces are packed in pairs into uint16 and
+    stored one pair per row, so scoring reads each pair column contiguously.
+    Pass the codebooks of an existing index to only re-encode documents.
+    """
+    n_docs, n_dims = docs_compressed.shape
+    if n_subspaces % 2 or n_dims % n_subspaces:
+        raise ValueError(f"{n_dims} dimensions cannot be split into {n_subspaces} equal subspaces (an even count)")
+    sub_dims = n_dims // n_subspaces
+
+    if codebooks is None:
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(
+            docs_compressed[np.sort(rng.choice(n_docs, size=min(sample_size, n_docs), replace=False))],
+            dtype=np.float32
+        )
+        codebooks = np.zeros((n_subspaces, PQ_CENTROIDS, sub_dims), dtype=np.float32)
+        for m in range(n_subspaces):
+            dims = slice(m * sub_dims, (m + 1) * sub_dims)
+            centroids = kmeans(sample[:, dims], PQ_CENTROIDS, n_iter=n_iter, seed=seed + m)
+            codebooks[m, :len(centroids)] = centroids
+
+    codes = np.zeros((n_subspaces // 2, n_docs), dtype=np.uint16)
+    for m in range(n_subspaces):
+        dims = slice(m * sub_dims, (m + 1) * sub_dims)
+        subspace_codes = nearest_centroids(docs_compressed[:, dims], codebooks[m]).astype(np.uint16)
+        codes[m // 2] |= subspace_codes << 8 if m % 2 == 0 else subspace_codes
+
+    np.save(os.path.join(directory, PQ_CODEBOOKS_FILE), codebooks)
+    np.save(os.path.join(directory, PQ_CODES_FILE), codes)
+
+
+class PQIndex:
+    """Product-quantized document vectors scored with asymmetric distance lookups.
+
+    Per query, the inner product of every query sub-vector with the 256
+    centroids of its subspace is precomputed, and combined per subspace
+    pair into a [n_subspaces / 2, 65536] lookup table; a document's
+    approximate score is then the sum of n_subspaces / 2 lookups on its
+    packed codes. Only the codes (n_subspaces bytes per doc) are streamed,
+    and the best candidates are re-ranked with exact scores.
+    """
+
+    def __init__(self, directory, chunk_size=65536):
+        self.codebooks = np.load(os.path.join(directory, PQ_CODEBOOKS_FILE))
+        self.codes = np.load(os.path.join(directory, PQ_CODES_FILE), mmap_mode="r")
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def exists(directory):
+        return os.path.isfile(os.path.join(directory, PQ_CODES_FILE))
+
+    def lookup_table(self, query_vec):
+        """Return float32 [n_subspaces / 2, 65536] approximate scores for every packed code pair"""
+        n_subspaces, _, sub_dims = self.codebooks.shape
+        query_subs = np.asarray(query_vec, dtype=np.float32).reshape(n_subspaces, sub_dims)
+        table = np.einsum("mcd,md->mc", self.codebooks, query_subs)
+        return (table[0::2, :, None] + table[1::2, None, :]).reshape(n_subspaces // 2, -1)
+
+    def search(self, query_vec, k, vectors, rerank=4):
+        """Return (doc indices, exact scores) of the top k, best first.
+
+        The top k * rerank documents by approximate score are re-scored
+        exactly against `vectors` (docs_compressed) before the final cut.
+        """
+        if rerank < 1:
+            raise ValueError(f"rerank must be at least 1, got {rerank}")
+        table = self.lookup_table(query_vec)
+
+        # Accumulate block by block so the temporaries stay cache-sized
+        approximate = np.empty(self.codes.shape[1], dtype=np.float32)
+        for start in range(0, self.codes.shape[1], self.chunk_size):
+            block = self.codes[:, start:start + self.chunk_size]
+            scores = approximate[start:start + block.shape[1]]
+            np.take(table[0], block[0], out=scores)
+            for pair in range(1, len(table)):
+                scores += np.take(table[pair], block[pair])
+
+        candidates = top_k_indices(approximate, k * rerank)
+        # Sorted ids keep the gather sequential and make ties resolve to the lower index
+        candidates.sort()
+        compute_dtype = scoring_dtype(vectors.dtype)
+        exact = vectors[candidates].astype(compute_dtype, copy=False) @ np.asarray(query_vec, dtype=compute_dtype)
+        best = top_k_indices(exact, k)
+        return candidates[best], exact[best]
@@ -0,0 +1,190 @@
+import bisect
+import json
+import os
+import re
+
+import numpy as np
+import scipy.sparse as sp
+
+from string_table import StringTable, save_string_table
+
+# On-disk layout of a saved vocabulary (all inside the models directory)
+CONFIG_FILE = "vectorizer.json"    # analyzer settings and stop words
+TERMS_FILE = "vocab_terms.npy"     # uint8 blob of UTF-8 terms, sorted, in column order
+OFFSETS_FILE = "vocab_offsets.npy" # int64 [n_terms + 1] start offsets into the blob
+IDF_FILE = "idf.npy"               # float64 [n_terms] idf weights
+
+# Inputs every parity check runs on top of the caller's documents: unicode
+# and accents, case, punctuation, stop words, repeated terms and n-grams
+PARITY_SAMPLES = [
+    "",
+    "the and of",
+    "League of Legends ranked grind, league LEAGUE league!",
+    "Café crème – naïve Pokémon speedrun; ÉLAN vital",
+    "日本語 配信 and 한국어 stream — Straße",
+    "just chatting just chatting just chatting with chat",
+    "gta-rp 2024 x2 a b c ab_cd e-mail @handle #hashtag",
+]
+
+
+def unsupported_settings(vectorizer):
+    """Return the analyzer settings of a TfidfVectorizer that QueryVectorizer does not replicate"""
+    checks = [
+        ("input", vectorizer.input, "content"),
+        ("analyzer", vectorizer.analyzer, "word"),
+        ("strip_accents", vectorizer.strip_accents, None),
+        ("preprocessor", vectorizer.preprocessor, None),
+        ("tokenizer", vectorizer.tokenizer, None),
+        ("binary", vectorizer.binary, False),
+    ]
+    return {name: value for name, value, supported in checks if value != supported}
+
+
+def check_parity(vectorizer, directory, documents=()):
+    """Raise ValueError unless the QueryVectorizer saved in directory reproduces vectorizer.transform().
+
+    Runs on PARITY_SAMPLES plus `documents`, so a sklearn upgrade or a new
+    analyzer setting that changes tokenization or weighting fails the build
+    instead of silently skewing query vectors.
+    """
+    documents = PARITY_SAMPLES + list(documents)
+    expected = vectorizer.transform(documents).tocsr()
+    actual = QueryVectorizer(directory).transform(documents)
+    expected.sort_indices()
+    if (np.array_equal(expected.indptr, actual.indptr) and np.array_equal(expected.indices, actual.indices)
+            and np.allclose(expected.data, actual.data, rtol=1e-9, atol=0)):
+        return
+    # Name the first document that differs
+    for row, doc in enumerate(documents):
+        expected_row, actual_row = expected[row], actual[row]
+        if (not np.array_equal(expected_row.indices, actual_row.indices)
+                or not np.allclose(expected_row.data, actual_row.data, rtol=1e-9, atol=0)):
+            raise ValueError(f"QueryVectorizer does not reproduce the sklearn TF-IDF vector of {doc[:80]!r}")
+
+
+def save_vocabulary(vectorizer, directory, check_documents=None):
+    """Save a fitted sklearn TfidfVectorizer in the compact QueryVectorizer format.
+
+    Raises ValueError for analyzer settings QueryVectorizer cannot
+    replicate; with check_documents, also verifies the saved vocabulary
+    against the vectorizer with check_parity().
+    """
+    unsupported = unsupported_settings(vectorizer)
+    if unsupported:
+        settings = ", ".join(f"{name}={value!r}" for name, value in unsupported.items())
+        raise ValueError(f"QueryVectorizer does not support these TfidfVectorizer settings: {settings}")
+
+    terms = vectorizer.get_feature_names_out()
+    encoded = [term.encode("utf-8") for term in terms]
+    # sklearn assigns column indices in sorted term order; lookups binary search on it
+    if any(a >= b for a, b in zip(encoded, encoded[1:])):
+        raise ValueError("Vectorizer vocabulary is not in sorted column order")
+
+    stop_words = vectorizer.get_stop_words()
+    config = {
+        "lowercase": vectorizer.lowercase,
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "stop_words": sorted(stop_words) if stop_words else [],
+        "norm": vectorizer.norm,
+        "use_idf": vectorizer.use_idf,
+        "sublinear_tf": vectorizer.sublinear_tf,
+    }
+    with open(os.path.join(directory, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    save_string_table(os.path.join(directory, TERMS_FILE), os.path.join(directory, OFFSETS_FILE), terms)
+    np.save(os.path.join(directory, IDF_FILE), vectorizer.idf_ if vectorizer.use_idf else np.ones(len(encoded)))
+    if check_documents is not None:
+        check_parity(vectorizer, directory, check_documents)
+
+
+class QueryVectorizer:
+    """Query-side replacement for a fitted sklearn TfidfVectorizer.
+
+    Loads the vocabulary from a sorted string table plus an idf array
+    (memory-mapped, so workers share them) instead of unpickling a Python
+    dict of every term. transform() produces the same TF-IDF vectors as the
+    sklearn vectorizer it was saved from.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.lowercase = config["lowercase"]
+        self.token_pattern = re.compile(config["token_pattern"])
+        self.min_n, self.max_n = config["ngram_range"]
+        self.stop_words = frozenset(config["stop_words"])
+        self.norm = config["norm"]
+        self.sublinear_tf = config["sublinear_tf"]
+
+        # Sorted, so StringTable doubles as a bisect-able sequence of terms
+        self.terms = StringTable(os.path.join(directory, TERMS_FILE), os.path.join(directory, OFFSETS_FILE))
+        self.idf = np.load(os.path.join(directory, IDF_FILE), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.terms)
+
+    def get_term(self, index):
+        """Return the term for a column index"""
+        return self.terms.get_str(index)
+
+    def term_index(self, term):
+        """Return the column index of a term, or -1 if it is not in the vocabulary"""
+        key = term.encode("utf-8")
+        index = bisect.bisect_left(self.terms, key)
+        if index < len(self.terms) and self.terms[index] == key:
+            return index
+        return -1
+
+    def tokenize(self, doc):
+        """The document's word tokens (lowercased, stop words removed), before n-grams are formed"""
+        if self.lowercase:
+            doc = doc.lower()
+        return [token for token in self.token_pattern.findall(doc) if token not in self.stop_words]
+
+    def analyze(self, doc):
+        """Split a document into terms exactly like sklearn's word analyzer"""
+        tokens = self.tokenize(doc)
+
+        if self.max_n == 1:
+            return tokens
+        terms = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), min(self.max_n + 1, len(tokens) + 1)):
+            for i in range(len(tokens) - n + 1):
+                terms.append(" ".join(tokens[i:i + n]))
+        return terms
+
+    def transform(self, raw_documents):
+        """Return the [n_docs, n_terms] TF-IDF CSR matrix for the documents"""
+        indptr = [0]
+        indices = []
+        counts = []
+        for doc in raw_documents:
+            doc_counts = {}
+            for term in self.analyze(doc):
+                index = self.term_index(term)
+                if index >= 0:
+                    doc_counts[index] = doc_counts.get(index, 0) + 1
+            columns = sorted(doc_counts)
+            indices.extend(columns)
+            counts.extend(doc_counts[column] for column in columns)
+            indptr.append(len(indices))
+
+        n_docs = len(indptr) - 1
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.asarray(counts, dtype=np.float64)
+        if self.sublinear_tf:
+            data = np.log(data) + 1
+        data *= self.idf[indices]
+
+        row_ids = np.repeat(np.arange(n_docs), np.diff(indptr))
+        if self.norm == "l2":
+            norms = np.sqrt(np.bincount(row_ids, weights=data ** 2, minlength=n_docs))
+        elif self.norm == "l1":
+            norms = np.bincount(row_ids, weights=np.abs(data), minlength=n_docs)
+        else:
+            norms = np.ones(n_docs)
+        norms[norms == 0] = 1
+        data /= norms[row_ids]
+
+        return sp.csr_matrix((data, indices, np.asarray(indptr)), shape=(n_docs, len(self.terms)))